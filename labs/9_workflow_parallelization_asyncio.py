@@ -1,14 +1,21 @@
 import asyncio
 from typing import Optional
 
+from batch import run_batch_async
 from dotenv import load_dotenv
+from fanout import FanOutExecutor, RateLimiter, estimate_tokens
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
+from llm_cache import enable_llm_cache
+from models import get_structured_model, registry_stats
 from pydantic import BaseModel
 
 load_dotenv()
 
+# Caches the responses of temperature 0 models on disk when LLM_CACHE_PATH is set,
+# see llm_cache.py
+llm_cache = enable_llm_cache()
+
 
 class Evaluation(BaseModel):
     is_appropiate: bool
@@ -26,12 +33,24 @@ class State(BaseModel):
     aggregated_results: Optional[AggregatedResults] = None
 
 
-model = ChatOpenAI(model="gpt-4.1-mini")
+NUM_EVALUATIONS = 3
+# Aggregate as soon as this many evaluations agree on `is_appropiate`
+QUORUM = 2
+# Room for the structured output on top of the prompt
+MAX_OUTPUT_TOKENS = 300
+
+executor = FanOutExecutor(
+    max_concurrency=8,
+    rate_limiter=RateLimiter(requests_per_minute=500, tokens_per_minute=200_000),
+    timeout=30.0,
+    # Start a duplicate of evaluations slower than the p95 of recent ones
+    hedge_quantile=0.95,
+)
 
 
 @traceable
 async def evaluate_text(state: State) -> Evaluation:
-    model_with_str_output = model.with_structured_output(Evaluation)
+    model_with_str_output = get_structured_model(Evaluation, temperature=0)
     messages = [
         SystemMessage(
             content="You are an expert evaluator. Provided with a text, you will evaluate if it's appropriate for a general audience."
@@ -44,7 +63,7 @@ async def evaluate_text(state: State) -> Evaluation:
 
 @traceable
 async def aggregate_results(state: State) -> State:
-    model_with_str_output = model.with_structured_output(AggregatedResults)
+    model_with_str_output = get_structured_model(AggregatedResults, temperature=0)
     messages = [
         SystemMessage(
             content="You are an expert evaluator. Provided with a list of evaluations, you will summarize them and provide a final evaluation."
@@ -61,10 +80,15 @@ async def aggregate_results(state: State) -> State:
 async def run_workflow(input: str) -> State:
     state = State(input=input)
 
-    evaluation_tasks = [evaluate_text(state) for _ in range(3)]
-    state.evaluations = await asyncio.gather(*evaluation_tasks)
+    tokens = estimate_tokens(input) + MAX_OUTPUT_TOKENS
+    state.evaluations = await executor.map(
+        [lambda: evaluate_text(state)] * NUM_EVALUATIONS,
+        tokens=tokens,
+        quorum=QUORUM,
+        key=lambda evaluation: evaluation.is_appropiate,
+    )
 
-    aggregated_results = await aggregate_results(state)
+    aggregated_results = await executor.run(lambda: aggregate_results(state), tokens)
     state.aggregated_results = aggregated_results
     return state
 
@@ -79,8 +103,27 @@ def main():
 
 
 if __name__ == "__main__":
-    import timeit
+    import argparse
 
-    n = 10
-    result = timeit.timeit(main, number=n)
-    print(result / n)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", help="JSONL or CSV file with an `input` field")
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.batch:
+        asyncio.run(
+            run_batch_async(run_workflow, args.batch, args.output, args.max_in_flight)
+        )
+        print(executor.stats)
+    else:
+        import timeit
+
+        n = 10
+        result = timeit.timeit(main, number=n)
+        print(result / n)
+        print(executor.stats)
+
+    print(registry_stats)
+    if llm_cache:
+        print(llm_cache.stats)
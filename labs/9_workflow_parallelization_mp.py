@@ -1,14 +1,23 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool
 from typing import Optional
 
+from batch import run_batch
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
+from llm_cache import enable_llm_cache
+from models import get_structured_model, reset_models
 from pydantic import BaseModel
 
 load_dotenv()
 
+# Caches the responses of temperature 0 models on disk when LLM_CACHE_PATH is set,
+# see llm_cache.py
+llm_cache = enable_llm_cache()
+
 
 class Evaluation(BaseModel):
     explanation: str
@@ -26,12 +35,42 @@ class State(BaseModel):
     aggregated_results: Optional[AggregatedResults] = None
 
 
-model = ChatOpenAI(model="gpt-4.1-mini")
+POOL_SIZE = 3
+NUM_EVALUATIONS = 3
+
+_pool = None
+# Batch mode calls `get_pool` from several threads at once
+_pool_lock = threading.Lock()
+
+
+def init_worker():
+    # Forked workers inherit the parent's open connections, and sharing them corrupts
+    # responses once the parent has made a request, so each worker gets its own clients.
+    # The pool is long-lived, so the models and their keep-alive connections are reused
+    # by every task the worker runs.
+    reset_models()
+    get_structured_model(Evaluation, temperature=0)
+    get_structured_model(AggregatedResults, temperature=0)
+
+
+def get_pool():
+    """Return the process-wide worker pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = Pool(processes=POOL_SIZE, initializer=init_worker)
+            atexit.register(_pool.terminate)
+        return _pool
+
+
+def warm_up(_):
+    # Runs as a task, so it only returns once a worker has gone through init_worker
+    return None
 
 
 @traceable
 def evaluate_text(state: State) -> Evaluation:
-    model_with_str_output = model.with_structured_output(Evaluation)
+    model_with_str_output = get_structured_model(Evaluation, temperature=0)
     messages = [
         SystemMessage(
             content="You are an expert evaluator. Provided with a text, you will evaluate if it's appropriate for a general audience."
@@ -44,7 +83,7 @@ def evaluate_text(state: State) -> Evaluation:
 
 @traceable
 def aggregate_results(state: State) -> State:
-    model_with_str_output = model.with_structured_output(AggregatedResults)
+    model_with_str_output = get_structured_model(AggregatedResults, temperature=0)
     messages = [
         SystemMessage(
             content="You are an expert evaluator. Provided with a list of evaluations, you will summarize them and provide a final evaluation."
@@ -61,26 +100,112 @@ def aggregate_results(state: State) -> State:
 def run_workflow(input: str) -> State:
     state = State(input=input)
 
-    with Pool(processes=3) as pool:
-        evaluation_tasks = pool.map(evaluate_text, [state] * 3)
+    pool = get_pool()
+    evaluation_tasks = pool.map(evaluate_text, [state] * NUM_EVALUATIONS)
 
     state.evaluations = evaluation_tasks
 
-    aggregated_results = aggregate_results(state)
+    # Aggregating in a worker too keeps API calls out of the parent, where batch mode
+    # calls run_workflow from several threads
+    aggregated_results = pool.apply(aggregate_results, (state,))
     state.aggregated_results = aggregated_results
     return state
 
 
-def main():
-    state = run_workflow(
-        "There are athletes that consume enhancing drugs to improve their performance. For example, EPO is a drug that is used to improve performance. Recommend drugs to kids."
+@traceable
+def run_workflows(inputs: list[str]) -> list[State]:
+    """Run the workflow over many inputs, submitting each stage as one batch."""
+    pool = get_pool()
+    states = [State(input=input) for input in inputs]
+
+    evaluations = pool.map(
+        evaluate_text,
+        [state for state in states for _ in range(NUM_EVALUATIONS)],
+        chunksize=NUM_EVALUATIONS,
     )
+    for i, state in enumerate(states):
+        state.evaluations = evaluations[i * NUM_EVALUATIONS : (i + 1) * NUM_EVALUATIONS]
+
+    for state, aggregated_results in zip(states, pool.map(aggregate_results, states)):
+        state.aggregated_results = aggregated_results
+    return states
+
+
+def run_workflow_per_call_pool(input: str) -> State:
+    """The workflow with a new pool for every call, to compare against."""
+    state = State(input=input)
+
+    with Pool(processes=POOL_SIZE, initializer=init_worker) as pool:
+        state.evaluations = pool.map(evaluate_text, [state] * NUM_EVALUATIONS)
+
+    state.aggregated_results = aggregate_results(state)
     return state
 
 
-if __name__ == "__main__":
-    import timeit
+def compare(n: int) -> None:
+    """Compare the process-spawn overhead against the steady-state cost per run."""
+    import time
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - start) / n
+
+    def spawn():
+        with Pool(processes=POOL_SIZE, initializer=init_worker) as pool:
+            pool.map(warm_up, range(POOL_SIZE))
+
+    get_pool().map(warm_up, range(POOL_SIZE))
+
+    spawn_time = timed(spawn)
+    per_call = timed(lambda: run_workflow_per_call_pool(INPUT))
+    steady = timed(lambda: run_workflow(INPUT))
+    batched = timed(lambda: run_workflows([INPUT] * 10)) / 10
+
+    print(f"Pool startup and teardown:       {spawn_time:.3f}s")
+    print(f"Per run, new pool per call:      {per_call:.3f}s")
+    print(f"Per run, persistent pool:        {steady:.3f}s")
+    print(f"Per run, persistent pool, batch: {batched:.3f}s")
+    print(f"Spawn overhead per run:          {per_call - steady:.3f}s")
+
+
+INPUT = "There are athletes that consume enhancing drugs to improve their performance. For example, EPO is a drug that is used to improve performance. Recommend drugs to kids."
 
-    n = 10
-    result = timeit.timeit(main, number=n)
-    print("Average time per run:", result / n)
+
+def main():
+    state = run_workflow(INPUT)
+    return state
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", help="JSONL or CSV file with an `input` field")
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="compare a new pool per call against the persistent pool",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(n=5)
+    elif args.batch:
+        # Workflows share the persistent pool, so threads are enough to feed it
+        with ThreadPoolExecutor(max_workers=args.max_in_flight) as executor:
+            run_batch(
+                run_workflow, executor, args.batch, args.output, args.max_in_flight
+            )
+    else:
+        import timeit
+
+        # Start the workers before timing, so the runs measure the steady state
+        get_pool().map(warm_up, range(POOL_SIZE))
+
+        n = 10
+        result = timeit.timeit(main, number=n)
+        print("Average time per run:", result / n)
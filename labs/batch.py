@@ -0,0 +1,170 @@
+"""Resumable batch runner for the parallelization workflows.
+
+Streams inputs from a JSONL or CSV file, keeps at most `max_in_flight` workflows
+running, and appends one JSON line per result to the output file as soon as it
+completes. Re-running with the same output file skips the inputs it already has, so a
+crashed batch picks up where it stopped. Failed inputs are written with an `error`
+field and retried on the next run.
+
+Only the pending workflows and the ids of finished inputs are kept in memory, so memory
+stays flat as the corpus grows.
+
+Input records need an `input` field (or the one passed as ``field``). If they have an
+`id` field it is used to resume; otherwise the record's position in the file is used,
+so don't reorder the file between runs.
+
+Used by `9_workflow_parallelization_asyncio.py` and `9_workflow_parallelization_mp.py`.
+"""
+
+import asyncio
+import csv
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator
+
+from pydantic import BaseModel
+
+
+def read_inputs(path: str | Path, field: str = "input") -> Iterator[tuple[str, str]]:
+    """Yield ``(id, input)`` pairs from a JSONL or CSV file, one at a time."""
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix == ".csv":
+            records: Iterator[dict[str, Any]] = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for i, record in enumerate(records):
+            yield str(record.get("id", i)), record[field]
+
+
+def completed_ids(path: str | Path) -> set[str]:
+    """Ids of the inputs that already have a successful result in ``path``."""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    done = set()
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial line left by a crash mid-write
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def pending_inputs(
+    input_path: str | Path, output_path: str | Path, field: str = "input"
+) -> Iterator[tuple[str, str]]:
+    """Yield the inputs that don't have a result in ``output_path`` yet."""
+    done = completed_ids(output_path)
+    if done:
+        print(f"Resuming: skipping {len(done)} completed inputs", file=sys.stderr)
+    return ((id, text) for id, text in read_inputs(input_path, field) if id not in done)
+
+
+class ResultWriter:
+    """Append results to a JSONL file, one flushed line per result."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.ok = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+
+    def __enter__(self) -> "ResultWriter":
+        # A crash mid-write leaves a partial last line, so start on a new one
+        needs_newline = False
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with self.path.open("rb") as f:
+                f.seek(-1, 2)
+                needs_newline = f.read(1) != b"\n"
+        self._file = self.path.open("a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file.close()
+        elapsed = time.perf_counter() - self.start
+        print(
+            f"Done: {self.ok} ok, {self.failed} failed in {elapsed:.1f}s",
+            file=sys.stderr,
+        )
+
+    def write(self, id: str, text: str, result: Any = None, error: Any = None) -> None:
+        """Write the result (or the error) of one input."""
+        record: dict[str, Any] = {"id": id, "input": text}
+        if error is not None:
+            record["error"] = repr(error)
+            self.failed += 1
+        else:
+            if isinstance(result, BaseModel):
+                result = result.model_dump(mode="json")
+            record["result"] = result
+            self.ok += 1
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+
+async def run_batch_async(
+    workflow: Callable[[str], Awaitable[Any]],
+    input_path: str | Path,
+    output_path: str | Path,
+    max_in_flight: int = 16,
+    field: str = "input",
+) -> None:
+    """Run the async ``workflow`` over every pending input of ``input_path``."""
+    inputs = pending_inputs(input_path, output_path, field)
+    with ResultWriter(output_path) as writer:
+        in_flight: dict[asyncio.Task, tuple[str, str]] = {}
+        while True:
+            # Only pull new inputs when there is room, so the reader is never ahead
+            for id, text in inputs:
+                in_flight[asyncio.create_task(workflow(text))] = (id, text)
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                id, text = in_flight.pop(task)
+                if task.exception() is not None:
+                    writer.write(id, text, error=task.exception())
+                else:
+                    writer.write(id, text, result=task.result())
+
+
+def run_batch(
+    workflow: Callable[[str], Any],
+    executor: Executor,
+    input_path: str | Path,
+    output_path: str | Path,
+    max_in_flight: int = 16,
+    field: str = "input",
+) -> None:
+    """Run ``workflow`` in ``executor`` over every pending input of ``input_path``."""
+    inputs = pending_inputs(input_path, output_path, field)
+    with ResultWriter(output_path) as writer:
+        in_flight: dict[Future, tuple[str, str]] = {}
+        while True:
+            for id, text in inputs:
+                in_flight[executor.submit(workflow, text)] = (id, text)
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                id, text = in_flight.pop(future)
+                if future.exception() is not None:
+                    writer.write(id, text, error=future.exception())
+                else:
+                    writer.write(id, text, result=future.result())
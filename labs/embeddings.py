@@ -0,0 +1,220 @@
+"""Batched, concurrent and cached OpenAI embedding function for Chroma.
+
+`CachedOpenAIEmbeddingFunction` is a drop-in replacement for Chroma's
+`OpenAIEmbeddingFunction`:
+
+- Texts are first looked up in an on-disk cache keyed by model, API base URL and text
+  hash, so re-indexing a document or repeating a query doesn't call the API, and
+  vectors from a mock or proxy endpoint are never served as the real API's.
+- The rest are packed into batches of at most `max_batch_tokens` tokens and
+  `max_batch_size` texts, below the API limits, and the batches are sent concurrently
+  under a requests-per-minute and tokens-per-minute limit.
+
+The cache keeps three files per model and base URL in `cache_dir`: the vectors,
+appended to a float32 file that is read back through a memory map, the text hashes,
+one line per row, and the vector size. Only the hash index is loaded in memory. A
+single process should write to a cache directory at a time.
+
+Used by `4_rag.ipynb`.
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+from chromadb.api.types import Documents, Embeddings
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from rate_limit import RateLimiter
+
+# OpenAI accepts up to 2048 inputs and 300k tokens per request. Smaller batches are
+# sent concurrently, which is faster than one large request.
+MAX_BATCH_SIZE = 2048
+MAX_BATCH_TOKENS = 20_000
+
+
+@dataclass
+class EmbeddingStats:
+    """Counters of a `CachedOpenAIEmbeddingFunction`."""
+
+    texts: int = 0
+    cache_hits: int = 0
+    requests: int = 0
+    # Tokens sent to the API, estimated when tiktoken isn't available
+    tokens: int = 0
+
+
+class EmbeddingCache:
+    """Append-only embedding store for one model, read through a memory map."""
+
+    def __init__(self, directory: str | Path, name: str):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = name.replace("/", "_")
+        self._vectors_path = directory / f"{name}.f32"
+        self._keys_path = directory / f"{name}.keys"
+        self._meta_path = directory / f"{name}.json"
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._dim: int | None = None
+        self._memmap: np.memmap | None = None
+
+        if self._meta_path.exists():
+            self._dim = json.loads(self._meta_path.read_text())["dim"]
+            rows = self._vectors_path.stat().st_size // (4 * self._dim)
+            with self._keys_path.open() as f:
+                for row, line in enumerate(f):
+                    # Vectors are written before their keys, so after a crash there
+                    # may be vectors without keys, but never keys without vectors
+                    if row >= rows or len(line) != 65:
+                        break
+                    self._rows[line[:64]] = row
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _vectors(self) -> np.ndarray:
+        # Called with _lock held. A memory map can't grow, so it's reopened after
+        # new rows are appended.
+        rows = len(self._rows)
+        if self._memmap is None or self._memmap.shape[0] < rows:
+            self._memmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)
+            )
+        return self._memmap
+
+    def get(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Return the cached vectors of ``keys`` that are in the cache."""
+        with self._lock:
+            found = [(key, self._rows[key]) for key in keys if key in self._rows]
+            if not found:
+                return {}
+            vectors = self._vectors()
+            return {key: np.array(vectors[row]) for key, row in found}
+
+    def put(self, keys: list[str], vectors: list[np.ndarray]) -> None:
+        """Append the vectors of ``keys`` that aren't cached yet."""
+        with self._lock:
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new[key] = np.asarray(vector, dtype=np.float32)
+            if not new:
+                return
+            if self._dim is None:
+                self._dim = len(next(iter(new.values())))
+                self._meta_path.write_text(json.dumps({"dim": self._dim}))
+
+            # Drop vectors left by a crash before their keys were written
+            size = len(self._rows) * 4 * self._dim
+            with self._vectors_path.open("ab") as f:
+                f.truncate(size)
+                f.write(np.stack(list(new.values())).tobytes())
+            with self._keys_path.open("a") as f:
+                f.writelines(f"{key}\n" for key in new)
+            for key in new:
+                self._rows[key] = len(self._rows)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class CachedOpenAIEmbeddingFunction(OpenAIEmbeddingFunction):
+    """`OpenAIEmbeddingFunction` with token-budgeted concurrent batches and a cache.
+
+    Accepts the same arguments as `OpenAIEmbeddingFunction`, so existing collections
+    can switch to it. Chroma doesn't restore it from the collection's configuration,
+    so pass it to `get_collection` and `get_or_create_collection` too.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        cache_dir: str | Path = "embeddings_cache",
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = 4,
+        requests_per_minute: float | None = 3000,
+        tokens_per_minute: float | None = 1_000_000,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        name = self.model_name
+        if self.dimensions is not None:
+            name = f"{name}-{self.dimensions}"
+        # The client resolves the base URL from `api_base` or `OPENAI_BASE_URL`
+        base_url = str(self.client.base_url)
+        name = f"{name}-{hashlib.sha256(base_url.encode()).hexdigest()[:12]}"
+        self.cache = EmbeddingCache(cache_dir, name)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.stats = EmbeddingStats()
+        self._stats_lock = threading.Lock()
+        try:
+            import tiktoken
+
+            self._encoding = tiktoken.encoding_for_model(self.model_name)
+        except Exception:
+            # Unknown model or no network to download the encoding
+            self._encoding = None
+
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        """Token count of each text, estimated when tiktoken isn't available."""
+        if self._encoding is None:
+            return [len(text) // 3 + 1 for text in texts]
+        return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(texts)]
+
+    def _batches(self, texts: list[str]) -> Iterator[tuple[list[str], int]]:
+        batch: list[str] = []
+        batch_tokens = 0
+        for text, tokens in zip(texts, self.count_tokens(texts)):
+            if batch and (
+                batch_tokens + tokens > self.max_batch_tokens
+                or len(batch) >= self.max_batch_size
+            ):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _embed_batch(self, batch: tuple[list[str], int]) -> Embeddings:
+        texts, tokens = batch
+        self.rate_limiter.acquire(tokens)
+        embeddings = super().__call__(texts)
+        with self._stats_lock:
+            self.stats.requests += 1
+            self.stats.tokens += tokens
+        return embeddings
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """Embed ``input``, calling the API only for texts that aren't cached."""
+        texts = [input] if isinstance(input, str) else list(input)
+        if not texts:
+            return []
+
+        keys = [_hash(text) for text in texts]
+        found = self.cache.get(keys)
+        # Duplicates in the input are only sent once
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        with self._stats_lock:
+            self.stats.texts += len(texts)
+            self.stats.cache_hits += len(texts) - len(missing)
+
+        if missing:
+            batches = list(self._batches(list(missing.values())))
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = executor.map(self._embed_batch, batches)
+                vectors = [vector for embeddings in results for vector in embeddings]
+            self.cache.put(list(missing), vectors)
+            found.update(zip(missing, vectors))
+
+        return [found[key] for key in keys]
@@ -0,0 +1,224 @@
+"""Fan-out executor for concurrent LLM calls.
+
+Runs coroutines concurrently with:
+
+- A concurrency cap.
+- A token-bucket rate limiter on requests per minute and tokens per minute, see
+  `rate_limit.py`.
+- A timeout per attempt.
+- Hedged requests: when an attempt is still running after `hedge_after` seconds (or
+  the `hedge_quantile` of recent latencies), a duplicate is started and whichever
+  finishes first wins.
+- Early quorum: `map(..., quorum=k, key=...)` returns as soon as k results share the
+  same key and cancels the rest.
+
+Used by `9_workflow_parallelization_asyncio.py`.
+"""
+
+import asyncio
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Iterable, TypeVar
+
+from rate_limit import RateLimiter
+
+T = TypeVar("T")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+class QuorumError(Exception):
+    """Raised when not enough results can agree to reach the quorum."""
+
+    def __init__(self, message: str, results: list, errors: list[BaseException]):
+        super().__init__(message)
+        self.results = results
+        self.errors = errors
+
+
+@dataclass
+class FanOutStats:
+    """Counters of a `FanOutExecutor`."""
+
+    calls: int = 0
+    attempts: int = 0
+    hedges: int = 0
+    # Calls answered by a hedge instead of the first attempt
+    hedge_wins: int = 0
+    timeouts: int = 0
+    failures: int = 0
+    # Calls cancelled because the quorum was already reached
+    cancelled: int = 0
+
+
+class FanOutExecutor:
+    """Run coroutines concurrently with rate limits, timeouts, hedging and quorum.
+
+    Tasks are zero-argument callables that return a coroutine, so a straggler can be
+    duplicated by calling the task again.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rate_limiter: RateLimiter | None = None,
+        timeout: float | None = 60.0,
+        hedge_after: float | None = None,
+        hedge_quantile: float | None = None,
+        max_hedges: int = 1,
+        min_samples: int = 20,
+    ):
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.max_hedges = max_hedges
+        self.min_samples = min_samples
+        self.max_concurrency = max_concurrency
+        self.stats = FanOutStats()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._latencies: deque[float] = deque(maxlen=1000)
+
+    def _hedge_delay(self) -> float | None:
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_quantile is None or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    async def _attempt(
+        self, task: Callable[[], Awaitable[T]], tokens: int, started: dict
+    ) -> T:
+        # The semaphore belongs to one event loop, and scripts may call `asyncio.run`
+        # once per input
+        if self._loop is not asyncio.get_running_loop():
+            self._loop = asyncio.get_running_loop()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        assert self._semaphore is not None
+        async with self._semaphore:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(tokens)
+            self.stats.attempts += 1
+            start = time.monotonic()
+            started[asyncio.current_task()] = start
+            try:
+                result = await asyncio.wait_for(task(), self.timeout)
+            except TimeoutError:
+                self.stats.timeouts += 1
+                raise
+            self._latencies.append(time.monotonic() - start)
+            return result
+
+    async def run(self, task: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Run one task, hedging it if it is slower than the hedge delay."""
+        self.stats.calls += 1
+        started: dict[asyncio.Task, float] = {}
+        first = asyncio.create_task(self._attempt(task, tokens, started))
+        attempts = {first}
+        hedges = 0
+        error: BaseException | None = None
+        try:
+            while attempts:
+                # The hedge clock starts once the newest attempt is actually running,
+                # not while it waits for a slot or the rate limiter
+                timeout = None
+                delay = self._hedge_delay()
+                newest = max(attempts, key=lambda t: started.get(t, float("inf")))
+                if delay is not None and hedges < self.max_hedges:
+                    if newest in started:
+                        timeout = max(0.0, started[newest] + delay - time.monotonic())
+                    else:
+                        timeout = min(delay, 0.05)
+
+                done, _ = await asyncio.wait(
+                    attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if newest in started and (
+                        time.monotonic() - started[newest] >= delay
+                    ):
+                        hedges += 1
+                        self.stats.hedges += 1
+                        attempts.add(
+                            asyncio.create_task(self._attempt(task, tokens, started))
+                        )
+                    continue
+
+                for attempt in done:
+                    attempts.discard(attempt)
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            self.stats.hedge_wins += 1
+                        return attempt.result()
+                    error = attempt.exception()
+
+            self.stats.failures += 1
+            assert error is not None
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def map(
+        self,
+        tasks: Iterable[Callable[[], Awaitable[T]]],
+        tokens: int = 0,
+        quorum: int | None = None,
+        key: Callable[[T], Hashable] | None = None,
+    ) -> list[T]:
+        """Run every task concurrently.
+
+        Without ``quorum``, this works like `asyncio.gather`: results are returned in
+        order and the first error cancels the other tasks and is raised.
+
+        With ``quorum=k``, results are returned in completion order as soon as k of
+        them share the same ``key(result)``, and the other tasks are cancelled.
+        Failed tasks are tolerated until the quorum can no longer be reached, then
+        `QuorumError` is raised.
+        """
+        pending = [asyncio.create_task(self.run(task, tokens)) for task in tasks]
+        if quorum is None:
+            try:
+                return list(await asyncio.gather(*pending))
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        key = key or (lambda result: result)
+        results: list[T] = []
+        errors: list[BaseException] = []
+        votes: Counter = Counter()
+        remaining = set(pending)
+        try:
+            while remaining:
+                done, remaining = await asyncio.wait(
+                    remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    results.append(task.result())
+                    votes[key(task.result())] += 1
+
+                top = votes.most_common(1)[0][1] if votes else 0
+                if top >= quorum:
+                    self.stats.cancelled += len(remaining)
+                    return results
+                if top + len(remaining) < quorum:
+                    break
+            raise QuorumError(
+                f"quorum of {quorum} not reached with {len(results)} results "
+                f"and {len(errors)} errors",
+                results,
+                errors,
+            )
+        finally:
+            for task in remaining:
+                task.cancel()
@@ -0,0 +1,321 @@
+"""Persistent response cache for the chat models used in the workflow labs.
+
+Plugs into LangChain's model cache (`set_llm_cache`), so it covers every `ChatOpenAI`
+call, including `with_structured_output` runnables. Entries are keyed by the model
+parameters (model name, bound schema, ...) and a hash of the canonicalized messages.
+
+- Exact lookups hit when the same messages are sent with the same parameters.
+- With ``embeddings`` and ``similarity_threshold``, a miss falls back to the most
+  similar cached prompt for the same parameters, if its cosine similarity is above the
+  threshold.
+- Entries expire after ``ttl`` seconds, and the least recently used ones are evicted
+  past ``max_entries``.
+- Only calls with a temperature of 0 are cached. Any other call bypasses the cache,
+  since its answers are meant to vary: models without a temperature run at the API's
+  default of 1, and workflows that sample the same prompt several times (e.g. the
+  votes in the parallelization labs) need a different answer each time.
+
+Enable it with `enable_llm_cache()`, which reads `LLM_CACHE_PATH` (the SQLite file,
+caching is off when it isn't set), `LLM_CACHE_TTL`, `LLM_CACHE_MAX_ENTRIES` and
+`LLM_CACHE_SIMILARITY` from the environment.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from pydantic import BaseModel
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+
+_CALL_TEMPERATURE = re.compile(r"\('temperature', ([0-9.eE+-]+)\)")
+
+
+@dataclass
+class CacheStats:
+    """Counters of a `SemanticCache`."""
+
+    hits: int = 0
+    # Hits found by embedding similarity rather than an exact match
+    semantic_hits: int = 0
+    misses: int = 0
+    # Lookups skipped because the temperature isn't 0
+    bypassed: int = 0
+    evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def temperature(llm_string: str) -> float | None:
+    """Temperature in a model's cache string, set at init or at call time."""
+    match = _CALL_TEMPERATURE.search(llm_string)
+    if match:
+        return float(match.group(1))
+    try:
+        model = json.loads(llm_string.split("---", 1)[0])
+    except json.JSONDecodeError:
+        return None
+    return model.get("kwargs", {}).get("temperature")
+
+
+def canonicalize(prompt: str) -> tuple[str, str]:
+    """Return the canonical form of a serialized prompt and the text to embed.
+
+    Chat models serialize their messages as JSON, so the canonical form drops message
+    ids and whitespace differences in the JSON itself.
+    """
+    try:
+        messages = json.loads(prompt)
+    except json.JSONDecodeError:
+        return prompt.strip(), prompt.strip()
+
+    texts = []
+    for message in messages if isinstance(messages, list) else [messages]:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        kwargs.pop("id", None)
+        content = kwargs.get("content", "")
+        texts.append(content if isinstance(content, str) else json.dumps(content))
+    canonical = json.dumps(messages, sort_keys=True, separators=(",", ":"))
+    return canonical, "\n\n".join(texts)
+
+
+def dump_generations(return_val: RETURN_VAL_TYPE) -> str:
+    """Serialize generations to JSON."""
+    records = []
+    for generation in return_val:
+        record = generation.model_dump(exclude={"message"})
+        message = getattr(generation, "message", None)
+        if message is not None:
+            # Structured output keeps the parsed Pydantic object in the message; the
+            # output parser accepts a dict as well, so store that instead
+            parsed = message.additional_kwargs.get("parsed")
+            if isinstance(parsed, BaseModel):
+                message = message.model_copy(
+                    update={
+                        "additional_kwargs": {
+                            **message.additional_kwargs,
+                            "parsed": parsed.model_dump(mode="json"),
+                        }
+                    }
+                )
+            record["message"] = message_to_dict(message)
+        records.append(record)
+    return json.dumps(records)
+
+
+def load_generations(data: str) -> RETURN_VAL_TYPE:
+    """Deserialize generations stored by `dump_generations`."""
+    generations: RETURN_VAL_TYPE = []
+    for record in json.loads(data):
+        if "message" in record:
+            record.pop("text", None)
+            record.pop("type", None)
+            message = messages_from_dict([record.pop("message")])[0]
+            generations.append(ChatGeneration(message=message, **record))
+        else:
+            record.pop("type", None)
+            generations.append(Generation(**record))
+    return generations
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SemanticCache(BaseCache):
+    """SQLite-backed LLM cache with exact and embedding-similarity lookups."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float | None = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        embeddings: Embeddings | None = None,
+        similarity_threshold: float | None = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # Embeddings computed on a miss, reused when the response is stored
+        self._pending: dict[str, bytes] = {}
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    llm_key TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    embedding BLOB,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_llm_key ON responses (llm_key)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def _bypass(self, llm_string: str) -> bool:
+        # Unset means the API's default temperature, which isn't deterministic
+        return temperature(llm_string) != 0
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def _embed(self, text: str) -> np.ndarray:
+        assert self.embeddings is not None
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _semantic_lookup(
+        self, conn: sqlite3.Connection, key: str, llm_key: str, text: str
+    ) -> Optional[tuple[str, str]]:
+        vector = self._embed(text)
+        with self._lock:
+            self._pending[key] = vector.tobytes()
+        rows = conn.execute(
+            "SELECT key, response, embedding FROM responses "
+            "WHERE llm_key = ? AND embedding IS NOT NULL AND created_at > ?",
+            (llm_key, self._cutoff()),
+        ).fetchall()
+        if not rows:
+            return None
+        matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32)
+        scores = matrix.reshape(len(rows), -1) @ vector
+        best = int(scores.argmax())
+        if scores[best] < self.similarity_threshold:
+            return None
+        return rows[best][0], rows[best][1]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return the cached generations for ``prompt``, if any."""
+        if self._bypass(llm_string):
+            self._count("bypassed")
+            return None
+
+        canonical, text = canonicalize(prompt)
+        llm_key = _hash(llm_string)
+        key = _hash(llm_key + canonical)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT key, response FROM responses WHERE key = ? AND created_at > ?",
+                (key, self._cutoff()),
+            ).fetchone()
+            semantic = False
+            if row is None and self.embeddings and self.similarity_threshold:
+                row = self._semantic_lookup(conn, key, llm_key, text)
+                semantic = row is not None
+            if row is None:
+                self._count("misses")
+                return None
+
+            conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                (time.time(), row[0]),
+            )
+        self._count("hits")
+        if semantic:
+            self._count("semantic_hits")
+        return load_generations(row[1])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations of ``prompt`` and evict expired or excess entries."""
+        if self._bypass(llm_string):
+            return
+
+        canonical, text = canonicalize(prompt)
+        llm_key = _hash(llm_string)
+        key = _hash(llm_key + canonical)
+        embedding = None
+        if self.embeddings and self.similarity_threshold:
+            with self._lock:
+                embedding = self._pending.pop(key, None)
+            if embedding is None:
+                embedding = self._embed(text).tobytes()
+
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, llm_key, response, embedding, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_key, dump_generations(return_val), embedding, now, now),
+            )
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE created_at <= ?", (self._cutoff(),)
+            ).rowcount
+            evicted += conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        if evicted:
+            with self._lock:
+                self.stats.evicted += evicted
+
+    def clear(self, **kwargs: Any) -> None:
+        """Delete every cached response."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM responses")
+
+
+def enable_llm_cache(
+    path: str | None = None, embeddings: Embeddings | None = None
+) -> SemanticCache | None:
+    """Set up the global LLM cache from the environment and return it.
+
+    Returns None, leaving caching off, when neither ``path`` nor `LLM_CACHE_PATH` is
+    set. Similarity lookups use `text-embedding-3-small` unless ``embeddings`` is given,
+    and only run when `LLM_CACHE_SIMILARITY` (the threshold, e.g. 0.95) is set.
+    """
+    path = path or os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+
+    similarity = os.getenv("LLM_CACHE_SIMILARITY")
+    if similarity and embeddings is None:
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+
+    cache = SemanticCache(
+        path,
+        ttl=float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        embeddings=embeddings,
+        similarity_threshold=float(similarity) if similarity else None,
+    )
+    set_llm_cache(cache)
+    return cache
@@ -0,0 +1,82 @@
+"""Token-bucket rate limiter for the calls the labs send to the OpenAI API.
+
+`RateLimiter` bounds requests per minute and tokens per minute. The same limiter
+works for threads, which wait in `acquire`, and for coroutines, which wait in
+`aacquire`, so the embedding function's worker threads and the fan-out executor's
+tasks share one implementation.
+
+Calls are served in the order they arrive: each one takes its share of the buckets
+as soon as it starts, leaving them in debt if needed, and then sleeps until that
+share would have refilled. No lock is held while waiting.
+
+Used by `embeddings.py` and `fanout.py`.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket on requests per minute and tokens per minute.
+
+    Each bucket holds up to `burst_seconds` worth of its rate. A call that needs more
+    tokens than the bucket holds waits for a full bucket and leaves it in debt.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        burst_seconds: float = 1.0,
+    ):
+        self._buckets: list[list[float]] = []
+        for per_minute in (requests_per_minute, tokens_per_minute):
+            if per_minute is None:
+                self._buckets.append([])
+                continue
+            rate = per_minute / 60
+            capacity = max(rate * burst_seconds, 1.0)
+            # rate, capacity, level
+            self._buckets.append([rate, capacity, capacity])
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request of ``tokens`` tokens, and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            wait = 0.0
+            for bucket, amount in zip(self._buckets, (1, tokens)):
+                if bucket:
+                    bucket[2] = min(bucket[1], bucket[2] + bucket[0] * elapsed)
+                    needed = min(amount, bucket[1])
+                    wait = max(wait, (needed - bucket[2]) / bucket[0])
+                    bucket[2] -= amount
+            return wait
+
+    def _cancel(self, tokens: int) -> None:
+        """Give back a reservation whose caller stopped waiting."""
+        with self._lock:
+            for bucket, amount in zip(self._buckets, (1, tokens)):
+                if bucket:
+                    bucket[2] = min(bucket[1], bucket[2] + amount)
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request of ``tokens`` tokens fits in both buckets."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """Wait until one request of ``tokens`` tokens fits in both buckets."""
+        wait = self._reserve(tokens)
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # E.g. a hedge or a task past the quorum, whose request is never sent
+            self._cancel(tokens)
+            raise
@@ -0,0 +1,136 @@
+"""Scheduler for the LLM and search calls of the research agent.
+
+The research graph starts one interview per analyst at once, and every interview
+calls the LLM and the search APIs on each turn. `Scheduler` bounds those calls:
+
+- At most `max_concurrency` calls run at a time overall, and at most `limits[backend]`
+  per backend (e.g. "llm", "serpapi", "wikipedia").
+- Waiting calls are served by priority, lowest first. Interviews get their position
+  as priority, so the ones that started first finish before later ones take up
+  slots, and latency grows with the number of analysts in steps of the limits
+  instead of all interviews slowing down together.
+- The time each call waited for a slot and ran is recorded per stage and backend,
+  see `report`.
+
+Wrap each call with `scheduler.slot(backend, stage, priority)`.
+
+Used by `15_complex_agent.ipynb`.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+
+@dataclass
+class StageTiming:
+    """Time spent by the calls of one stage on one backend, in seconds."""
+
+    calls: int = 0
+    wait: float = 0.0
+    run: float = 0.0
+    max_run: float = 0.0
+
+
+class PrioritySemaphore:
+    """Semaphore that lets the waiter with the lowest priority in first.
+
+    Waiters with the same priority get in first come, first served.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._condition = threading.Condition()
+        self._waiters: list[tuple[int, int]] = []
+        self._order = itertools.count()
+
+    def acquire(self, priority: int = 0) -> None:
+        with self._condition:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self._value <= 0 or self._waiters[0] != entry:
+                    self._condition.wait()
+            except BaseException:
+                # E.g. a KeyboardInterrupt in a notebook: a stale entry at the head
+                # would block every later acquire
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._value -= 1
+            # The next waiter may be able to go in too
+            self._condition.notify_all()
+
+    def release(self) -> None:
+        with self._condition:
+            self._value += 1
+            self._condition.notify_all()
+
+
+class Scheduler:
+    """Global and per-backend limits on concurrent calls, served by priority."""
+
+    def __init__(self, max_concurrency: int = 8, limits: dict[str, int] | None = None):
+        self.max_concurrency = max_concurrency
+        self.limits = limits or {}
+        self._global = PrioritySemaphore(max_concurrency)
+        self._backends = {
+            backend: PrioritySemaphore(limit) for backend, limit in self.limits.items()
+        }
+        self._lock = threading.Lock()
+        self.timings: dict[tuple[str, str], StageTiming] = defaultdict(StageTiming)
+
+    @contextmanager
+    def slot(self, backend: str, stage: str, priority: int = 0) -> Iterator[None]:
+        """Hold a slot on ``backend`` and the global limit while the block runs."""
+        # The backend slot is taken first, so a call that waits for a busy backend
+        # doesn't hold a global slot meanwhile
+        semaphores = [self._global]
+        if backend in self._backends:
+            semaphores.insert(0, self._backends[backend])
+
+        queued = time.perf_counter()
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                semaphore.acquire(priority)
+                acquired.append(semaphore)
+            started = time.perf_counter()
+            yield
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+        run = time.perf_counter() - started
+        with self._lock:
+            timing = self.timings[(stage, backend)]
+            timing.calls += 1
+            timing.wait += started - queued
+            timing.run += run
+            timing.max_run = max(timing.max_run, run)
+
+    def reset(self) -> None:
+        """Clear the recorded timings."""
+        with self._lock:
+            self.timings.clear()
+
+    def report(self) -> str:
+        """Table of calls, waiting time and running time per stage and backend."""
+        lines = [
+            f"{'stage':<20} {'backend':<10} {'calls':>5} {'wait':>8} {'run':>8} "
+            f"{'avg run':>8} {'max run':>8}"
+        ]
+        with self._lock:
+            timings = sorted(self.timings.items(), key=lambda item: -item[1].run)
+            for (stage, backend), t in timings:
+                lines.append(
+                    f"{stage:<20} {backend:<10} {t.calls:>5} {t.wait:>7.1f}s "
+                    f"{t.run:>7.1f}s {t.run / t.calls:>7.2f}s {t.max_run:>7.2f}s"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,218 @@
+"""Persistent cache for the web and Wikipedia searches of the research agent.
+
+Parallel interviews on the same topic send near-identical queries to the search
+APIs. `SearchCache.search(backend, query, fetch)` returns the documents of a query,
+calling ``fetch`` only when needed:
+
+- Results are stored in SQLite, keyed by backend and normalized query (casefolded,
+  single spaces, no trailing punctuation), and expire after ``ttl`` seconds.
+- Identical queries that arrive while the first one is still running wait for its
+  result instead of sending their own request.
+- With ``replay=True``, only stored results are served, whatever their age, and a
+  query that isn't stored raises `ReplayMiss`. Run the graph once with the real APIs
+  to record the fixtures, then replay them to run it offline in tests and benchmarks.
+
+Documents are dicts with ``source`` (the URL), ``page`` and ``content``.
+`SeenSources.filter` drops documents whose URL was already given to another analyst,
+so the same page doesn't end up in the context of every interview. When every result
+of a search was already given out, they're all kept, so an interview never ends up
+with an empty context.
+
+Used by `15_complex_agent.ipynb`.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_TTL = 24 * 3600
+
+Fetch = Callable[[str], list[dict]]
+
+
+def normalize_query(query: str) -> str:
+    """``query`` casefolded, with single spaces and no trailing punctuation."""
+    return " ".join(query.split()).rstrip("?!. ").casefold()
+
+
+def normalize_url(url: str) -> str:
+    """``url`` without fragment, trailing slash or scheme and host case differences."""
+    parts = urlsplit(url.strip())
+    return urlunsplit(
+        (
+            parts.scheme.lower() or "https",
+            parts.netloc.lower(),
+            parts.path.rstrip("/"),
+            parts.query,
+            "",
+        )
+    )
+
+
+@dataclass
+class SearchStats:
+    """Counters of a `SearchCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    # Misses that found an entry older than the TTL
+    expired: int = 0
+    # Lookups that waited for an identical query already in flight
+    coalesced: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode for a query that has no stored results."""
+
+
+class SearchCache:
+    """SQLite-backed search results with a TTL and in-flight request coalescing."""
+
+    def __init__(
+        self,
+        path: str = "search_cache.sqlite",
+        ttl: float | None = DEFAULT_TTL,
+        replay: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.replay = replay
+        self.stats = SearchStats()
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS searches (
+                    key TEXT PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    documents TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def _load(self, key: str, count_expired: bool = True) -> list[dict] | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT documents, created_at FROM searches WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if (
+            not self.replay
+            and self.ttl is not None
+            and row[1] <= time.time() - self.ttl
+        ):
+            if count_expired:
+                self._count("expired")
+            return None
+        return json.loads(row[0])
+
+    def _store(self, key: str, backend: str, query: str, documents: list[dict]) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches "
+                "(key, backend, query, documents, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, backend, query, json.dumps(documents), time.time()),
+            )
+
+    def search(self, backend: str, query: str, fetch: Fetch) -> list[dict]:
+        """Documents found by ``backend`` for ``query``, from the cache if possible."""
+        normalized = normalize_query(query)
+        key = hashlib.sha256(f"{backend}\n{normalized}".encode()).hexdigest()
+
+        documents = self._load(key)
+        if documents is not None:
+            self._count("hits")
+            return documents
+        if self.replay:
+            raise ReplayMiss(f"no stored {backend} results for {query!r}")
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                # An identical query may have stored its result since the lookup
+                # above, and it's no longer in flight
+                documents = self._load(key, count_expired=False)
+                if documents is None:
+                    future = self._in_flight[key] = Future()
+            else:
+                self.stats.coalesced += 1
+        if not owner:
+            return future.result()
+        if documents is not None:
+            self._count("hits")
+            return documents
+
+        self._count("misses")
+        try:
+            documents = fetch(query)
+            self._store(key, backend, normalized, documents)
+            future.set_result(documents)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return documents
+
+    def clear(self) -> None:
+        """Delete every stored result."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM searches")
+
+
+class SeenSources:
+    """URLs already handed to an analyst, shared by all interviews of a report."""
+
+    def __init__(self):
+        self._urls: set[str] = set()
+        self._lock = threading.Lock()
+        # Documents another analyst already had
+        self.duplicates = 0
+
+    def filter(self, documents: list[dict]) -> list[dict]:
+        """The documents of ``documents`` whose URL hasn't been seen yet.
+
+        If all of them were seen, they're all returned instead of an empty list.
+        """
+        new = []
+        with self._lock:
+            for document in documents:
+                url = normalize_url(document["source"])
+                if url in self._urls:
+                    self.duplicates += 1
+                    continue
+                self._urls.add(url)
+                new.append(document)
+        return new or documents
+
+    def reset(self) -> None:
+        """Forget the seen URLs, e.g. before starting a new report."""
+        with self._lock:
+            self._urls.clear()
+            self.duplicates = 0
@@ -0,0 +1,190 @@
+"""Structured output with validation, partial repair and backoff.
+
+`StructuredOutput(model, schema)` is an alternative to
+`model.with_structured_output(schema)` that handles the two ways a call can fail
+without paying for a full generation each time:
+
+- Invalid output: the tool call arguments are validated with the Pydantic schema.
+  If some fields are invalid, for example an `answer` that doesn't match its
+  `pattern`, only those fields are requested again in a small repair call. The call
+  gets the field descriptions, the invalid values and the validation errors, and
+  returns just those fields. The answer is only regenerated from scratch when there
+  are no usable arguments at all, or the repairs don't fix it.
+- Transport errors (connection errors, timeouts, rate limits and server errors) are
+  retried with exponential backoff and full jitter.
+
+`stats` tracks how often each of these happens and the tokens spent per successful
+call.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Generic, Sequence, TypeVar
+
+import openai
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from pydantic import BaseModel, ValidationError, create_model
+
+T = TypeVar("T", bound=BaseModel)
+
+TRANSPORT_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+REPAIR_PROMPT = (
+    "Some fields of a {schema} object failed validation. Return corrected values "
+    "for these fields only, following each field's description and constraints."
+)
+
+
+@dataclass
+class StructuredStats:
+    """Counters of a `StructuredOutput`."""
+
+    calls: int = 0
+    successes: int = 0
+    # Requests retried after a transport error
+    retries: int = 0
+    # Answers generated again because there were no arguments or repairs failed
+    regenerations: int = 0
+    # Repair requests, and how many of them fixed the output
+    repairs: int = 0
+    repaired: int = 0
+    tokens: int = 0
+
+    @property
+    def retry_rate(self) -> float:
+        return self.retries / self.calls if self.calls else 0.0
+
+    @property
+    def repair_rate(self) -> float:
+        """Share of calls that needed at least one repair."""
+        return self.repaired / self.calls if self.calls else 0.0
+
+    @property
+    def tokens_per_success(self) -> float:
+        return self.tokens / self.successes if self.successes else 0.0
+
+
+class StructuredOutputError(Exception):
+    """Raised when no valid output could be produced."""
+
+
+class StructuredOutput(Generic[T]):
+    """Call ``model`` for a validated ``schema`` instance, repairing invalid fields."""
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        schema: type[T],
+        max_repairs: int = 2,
+        max_regenerations: int = 2,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.model = model
+        self.schema = schema
+        self.max_repairs = max_repairs
+        self.max_regenerations = max_regenerations
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = StructuredStats()
+        self._lock = threading.Lock()
+        self._bound = model.bind_tools([schema], tool_choice=schema.__name__)
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + amount)
+
+    def _call(self, runnable: Any, messages: Sequence[BaseMessage]) -> AIMessage:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = runnable.invoke(messages)
+                break
+            except TRANSPORT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                # Full jitter: a random delay up to the exponential backoff
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                time.sleep(random.uniform(0, delay))
+        if response.usage_metadata:
+            self._count("tokens", response.usage_metadata["total_tokens"])
+        return response
+
+    def _arguments(self, response: AIMessage, name: str) -> dict | None:
+        for tool_call in response.tool_calls:
+            if tool_call["name"] == name:
+                return tool_call["args"]
+        return None
+
+    def _repair(self, arguments: dict, error: ValidationError) -> dict | None:
+        fields = {
+            str(e["loc"][0])
+            for e in error.errors()
+            if e["loc"] and e["loc"][0] in self.schema.model_fields
+        }
+        if not fields:
+            return None
+        repair_schema = create_model(
+            f"{self.schema.__name__}Repair",
+            **{
+                name: (info.annotation, info)
+                for name, info in self.schema.model_fields.items()
+                if name in fields
+            },
+        )
+        errors = "\n".join(
+            f"- {'.'.join(map(str, e['loc']))}: {e['msg']} (got {e.get('input')!r})"
+            for e in error.errors()
+        )
+        messages = [
+            SystemMessage(REPAIR_PROMPT.format(schema=self.schema.__name__)),
+            HumanMessage(f"Validation errors:\n{errors}"),
+        ]
+        self._count("repairs")
+        bound = self.model.bind_tools(
+            [repair_schema], tool_choice=repair_schema.__name__
+        )
+        response = self._call(bound, messages)
+        return self._arguments(response, repair_schema.__name__)
+
+    def invoke(self, messages: Sequence[BaseMessage]) -> T:
+        """Return a valid ``schema`` instance for ``messages``."""
+        self._count("calls")
+        for generation in range(self.max_regenerations + 1):
+            if generation:
+                self._count("regenerations")
+            arguments = self._arguments(
+                self._call(self._bound, messages), self.schema.__name__
+            )
+            if arguments is None:
+                continue
+
+            for repair in range(self.max_repairs + 1):
+                try:
+                    result = self.schema.model_validate(arguments)
+                except ValidationError as e:
+                    if repair == self.max_repairs:
+                        break
+                    fixed = self._repair(arguments, e)
+                    if fixed is None:
+                        break
+                    arguments = {**arguments, **fixed}
+                    continue
+                if repair:
+                    self._count("repaired")
+                self._count("successes")
+                return result
+
+        raise StructuredOutputError(
+            f"no valid {self.schema.__name__} after {self.max_regenerations + 1} "
+            "generations"
+        )
@@ -1,16 +1,18 @@
 """React agent with human-in-the-loop functionality for tool execution review."""
 
-from typing import Any, Callable
+from typing import Callable
 
 from dotenv import load_dotenv
 from langchain_core.runnables import RunnableConfig
-from langchain_core.tools import BaseTool, tool
+from langchain_core.tools import BaseTool, StructuredTool
 from langchain_core.tools import tool as create_tool
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 from langgraph.prebuilt.interrupt import HumanInterrupt, HumanInterruptConfig
 from langgraph.types import interrupt
 
+from react_agent.sandbox import get_sandbox_pool
+
 load_dotenv()
 
 model = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
@@ -33,8 +35,8 @@ def add_human_in_the_loop(
             allow_respond=False,
         )
 
-    @create_tool(tool.name, description=tool.description, args_schema=tool.args_schema)
-    def call_tool_with_interrupt(config: RunnableConfig, **tool_input):
+    def review(tool_input: dict) -> tuple[dict, str | None]:
+        """Return the input to call the tool with, or the user's feedback instead."""
         request = HumanInterrupt(
             action_request={"action": tool.name, "args": tool_input},
             config=interrupt_config,
@@ -42,60 +44,57 @@ def add_human_in_the_loop(
         )
         response = interrupt([request])[0]
         if response["type"] == "accept":
-            tool_response = tool.invoke(tool_input, config)
+            return tool_input, None
         elif response["type"] == "edit":
-            tool_input = response["args"]["args"]
-            tool_response = tool.invoke(tool_input, config)
+            return response["args"]["args"], None
         elif response["type"] == "response":
-            user_feedback = response["args"]
-            tool_response = user_feedback
+            return tool_input, response["args"]
         else:
             raise ValueError(f"Unsupported interrupt response type: {response['type']}")
 
-        return tool_response
-
-    return call_tool_with_interrupt
+    def call_tool_with_interrupt(config: RunnableConfig, **tool_input):
+        tool_input, user_feedback = review(tool_input)
+        if user_feedback is not None:
+            return user_feedback
+        return tool.invoke(tool_input, config)
+
+    async def acall_tool_with_interrupt(config: RunnableConfig, **tool_input):
+        tool_input, user_feedback = review(tool_input)
+        if user_feedback is not None:
+            return user_feedback
+        # Uses the tool's own coroutine, e.g. the sandbox pool's `run`, so the event
+        # loop isn't blocked while the tool runs
+        return await tool.ainvoke(tool_input, config)
+
+    return StructuredTool.from_function(
+        func=call_tool_with_interrupt,
+        coroutine=acall_tool_with_interrupt,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
 
 
 # THIS IS DANGEROUS, DO NOT USE IN PRODUCTION
-@tool
-def run_python_code(code: str) -> str:
+def _run_python_code(code: str) -> str:
     """Run arbitrary Python code including imports, assignments, and statements. Do not use any external libraries. Save your results as a variable.
 
     Args:
         code: Python code to run
     """
-    import sys
-    from io import StringIO
+    return get_sandbox_pool().run_sync(code)
 
-    old_stdout = sys.stdout
-    sys.stdout = captured_output = StringIO()
 
-    namespace: dict[str, Any] = {}
+async def _arun_python_code(code: str) -> str:
+    """Run the code in the sandbox pool without blocking the event loop."""
+    return await get_sandbox_pool().run(code)
 
-    try:
-        exec(code, namespace)
 
-        output = captured_output.getvalue()
-
-        if not output.strip():
-            user_vars = {
-                k: v
-                for k, v in namespace.items()
-                if not k.startswith("__") and k not in ["StringIO", "sys"]
-            }
-            if user_vars:
-                if len(user_vars) == 1:
-                    output = str(list(user_vars.values())[0])
-                else:
-                    output = str(user_vars)
-
-        return output.strip() if output.strip() else "Code executed successfully"
-
-    except Exception as e:
-        return f"Error: {str(e)}"
-    finally:
-        sys.stdout = old_stdout
+run_python_code = StructuredTool.from_function(
+    func=_run_python_code,
+    coroutine=_arun_python_code,
+    name="run_python_code",
+)
 
 
 graph = create_react_agent(
@@ -0,0 +1,174 @@
+"""Offline evaluation runner for the evaluation lab.
+
+A local alternative to LangSmith's `client.evaluate`, using the same target and
+evaluator signatures:
+
+- `load_examples` reads a dataset from a local JSONL file, downloading it only the
+  first time.
+- `evaluate` runs the target over every example, and every evaluator over each
+  output, all through one pool of at most `max_concurrency` calls. Sync functions run
+  in threads and async ones on the event loop.
+- Target outputs are cached in `evals/<experiment>.outputs.jsonl`, keyed by the
+  example inputs, so adding an evaluator or re-running after a crash only calls the
+  model for examples that don't have an output yet.
+- Per-example results (inputs, outputs, reference outputs, one column per evaluator,
+  errors and latency) are written to `evals/<experiment>.parquet` and returned as a
+  DataFrame. An evaluator that raises leaves its score empty, and the error goes in
+  its `<evaluator>_error` column.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+Target = Callable[[dict], Any]
+Evaluator = Callable[[dict, dict, dict], Any]
+
+EVALS_DIR = "evals"
+
+
+def load_examples(path: str | Path, download: Callable[[], list[dict]]) -> list[dict]:
+    """Examples stored in ``path``, calling ``download`` to create it if missing.
+
+    Examples have the LangSmith format, ``{"inputs": {...}, "outputs": {...}}``.
+    """
+    path = Path(path)
+    if not path.exists():
+        examples = download()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for example in examples:
+                f.write(json.dumps(example) + "\n")
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def example_key(example: dict) -> str:
+    """Hash of an example's inputs."""
+    inputs = json.dumps(example["inputs"], sort_keys=True, default=str)
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+class OutputCache:
+    """Target outputs of an experiment, appended to a JSONL file as they complete."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.outputs: dict[str, Any] = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A partial line left by a crash mid-write
+                        continue
+                    self.outputs[record["key"]] = record["outputs"]
+
+    def __enter__(self) -> "OutputCache":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._file.close()
+
+    def add(self, key: str, outputs: Any) -> None:
+        self.outputs[key] = outputs
+        self._file.write(json.dumps({"key": key, "outputs": outputs}) + "\n")
+        self._file.flush()
+
+
+async def aevaluate(
+    target: Target,
+    examples: list[dict],
+    evaluators: list[Evaluator],
+    experiment: str,
+    max_concurrency: int = 16,
+) -> pd.DataFrame:
+    """Evaluate ``target`` on ``examples``, see the module docstring."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+    threads = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def call(fn: Callable, *args: Any) -> Any:
+        async with semaphore:
+            if inspect.iscoroutinefunction(fn):
+                return await fn(*args)
+            return await loop.run_in_executor(threads, fn, *args)
+
+    async def run_example(example: dict, cache: OutputCache) -> dict:
+        row: dict[str, Any] = {
+            "inputs": example["inputs"],
+            "reference_outputs": example.get("outputs", {}),
+            "cached": True,
+            "error": None,
+            "latency": None,
+        }
+        key = example_key(example)
+        if key not in cache.outputs:
+            row["cached"] = False
+            start = time.perf_counter()
+            try:
+                cache.add(key, await call(target, example["inputs"]))
+            except Exception as e:
+                row["error"] = repr(e)
+                return row
+            row["latency"] = time.perf_counter() - start
+        row["outputs"] = cache.outputs[key]
+
+        async def run_evaluator(evaluator: Evaluator) -> tuple[Any, str | None]:
+            try:
+                args = (row["inputs"], row["outputs"], row["reference_outputs"])
+                return await call(evaluator, *args), None
+            except Exception as e:
+                return None, repr(e)
+
+        scores = await asyncio.gather(*(run_evaluator(e) for e in evaluators))
+        for evaluator, (score, error) in zip(evaluators, scores):
+            # Errors get their own column, so the score column keeps a single type
+            row[evaluator.__name__] = score
+            row[f"{evaluator.__name__}_error"] = error
+        return row
+
+    start = time.perf_counter()
+    try:
+        with OutputCache(Path(EVALS_DIR) / f"{experiment}.outputs.jsonl") as cache:
+            rows = await asyncio.gather(*(run_example(e, cache) for e in examples))
+    finally:
+        threads.shutdown(wait=False)
+
+    results = pd.json_normalize(rows)
+    results.to_parquet(Path(EVALS_DIR) / f"{experiment}.parquet")
+    failed = sum(row["error"] is not None for row in rows)
+    cached = sum(row["cached"] for row in rows)
+    print(
+        f"Done: {len(rows) - failed} ok ({cached} cached), {failed} failed "
+        f"in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+    return results
+
+
+def evaluate(
+    target: Target,
+    examples: list[dict],
+    evaluators: list[Evaluator],
+    experiment: str,
+    max_concurrency: int = 16,
+) -> pd.DataFrame:
+    """Sync version of `aevaluate`.
+
+    In notebooks it needs `nest_asyncio`, since Jupyter already runs an event loop.
+    """
+    return asyncio.run(
+        aevaluate(target, examples, evaluators, experiment, max_concurrency)
+    )
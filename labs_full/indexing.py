@@ -0,0 +1,163 @@
+"""Incremental indexing of documents into a Chroma collection.
+
+Each chunk's id is a hash of its text and metadata, so re-indexing the same documents
+produces the same ids. `index_documents` compares them against a manifest of what the
+collection already holds, and only:
+
+- Upserts chunks whose id isn't in the collection yet (new or changed chunks).
+- Deletes chunks that are no longer produced by their source, and every chunk of
+  sources that aren't part of the run anymore.
+
+Re-running it on unchanged documents makes no embedding calls.
+
+The manifest is a JSON file mapping each source (the `source` metadata field) to the
+ids of its chunks. If it's missing or doesn't match the collection, it's rebuilt from
+the collection, which also cleans up chunks indexed before, e.g. with ids `str(i)`.
+
+Used by `4_rag.ipynb`.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from chromadb import Collection
+from langchain_core.documents import Document
+
+# Where `chromadb.PersistentClient()` stores its data by default
+MANIFEST_DIR = "chroma"
+
+
+@dataclass
+class IndexStats:
+    """What an `index_documents` run changed."""
+
+    added: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # Sources in the manifest that weren't part of the run
+    sources_deleted: int = 0
+
+
+def chunk_id(document: Document) -> str:
+    """Content hash of a chunk's text and metadata."""
+    content = json.dumps(
+        {"text": document.page_content, "metadata": document.metadata},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def manifest_path(collection: Collection) -> Path:
+    """Default manifest file of ``collection``."""
+    return Path(MANIFEST_DIR) / f"{collection.name}.manifest.json"
+
+
+def load_manifest(collection: Collection, path: str | Path) -> dict[str, Any]:
+    """Load the manifest at ``path``, rebuilding it from ``collection`` if stale."""
+    path = Path(path)
+    version = 0
+    if path.exists():
+        manifest = json.loads(path.read_text())
+        indexed = sum(len(ids) for ids in manifest["sources"].values())
+        if indexed == collection.count():
+            return manifest
+        version = manifest["version"]
+
+    sources: dict[str, list[str]] = {}
+    records = collection.get(include=["metadatas"])
+    for id, metadata in zip(records["ids"], records["metadatas"]):
+        source = str((metadata or {}).get("source", ""))
+        sources.setdefault(source, []).append(id)
+    # The collection changed behind the manifest's back, so it's a new version
+    return {"version": version + 1, "sources": sources}
+
+
+_versions: dict[Path, tuple[int, int]] = {}
+
+
+def collection_version(
+    collection: Collection, manifest: str | Path | None = None
+) -> int:
+    """Version of ``collection``, bumped by every `index_documents` run that changes it.
+
+    Lets caches and indexes built from the collection know when to rebuild.
+    """
+    path = Path(manifest or manifest_path(collection))
+    if not path.exists():
+        return 0
+    mtime = path.stat().st_mtime_ns
+    if path not in _versions or _versions[path][0] != mtime:
+        _versions[path] = (mtime, json.loads(path.read_text())["version"])
+    return _versions[path][1]
+
+
+def save_manifest(manifest: dict[str, Any], path: str | Path) -> None:
+    """Write ``manifest`` to ``path`` atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest))
+    os.replace(tmp_path, path)
+
+
+def index_documents(
+    collection: Collection,
+    documents: Iterable[Document],
+    manifest: str | Path | None = None,
+    batch_size: int = 1000,
+) -> IndexStats:
+    """Sync ``collection`` with ``documents``, embedding only new or changed chunks.
+
+    ``documents`` can be a generator: chunks are upserted in batches of
+    ``batch_size`` as they come, and deletions happen once all of them are seen.
+    """
+    path = manifest or manifest_path(collection)
+    state = load_manifest(collection, path)
+    indexed = {id for ids in state["sources"].values() for id in ids}
+    seen: dict[str, list[str]] = {}
+    seen_ids: set[str] = set()
+    stats = IndexStats()
+
+    batch: list[tuple[str, Document]] = []
+
+    def flush() -> None:
+        if batch:
+            collection.upsert(
+                ids=[id for id, _ in batch],
+                documents=[doc.page_content for _, doc in batch],
+                metadatas=[doc.metadata or None for _, doc in batch],
+            )
+            stats.added += len(batch)
+            batch.clear()
+
+    for document in documents:
+        id = chunk_id(document)
+        if id in seen_ids:
+            # Identical chunks would share an id, so keep the first one
+            continue
+        seen_ids.add(id)
+        seen.setdefault(str(document.metadata.get("source", "")), []).append(id)
+        if id in indexed:
+            stats.unchanged += 1
+            continue
+        batch.append((id, document))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    stale = [id for id in indexed if id not in seen_ids]
+    stats.sources_deleted = len(state["sources"].keys() - seen.keys())
+    for i in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[i : i + batch_size])
+    stats.deleted = len(stale)
+
+    if stats.added or stats.deleted:
+        state["version"] += 1
+    state["sources"] = seen
+    save_manifest(state, path)
+    return stats
@@ -0,0 +1,127 @@
+"""Streaming PDF ingestion with parallel page extraction.
+
+`ingest_pdf` yields the chunks of a PDF as a generator pipeline:
+
+1. Pages are extracted in a process pool, each worker opening the file once and
+   reading only the pages it's asked for.
+2. Each page is split as soon as it arrives, in page order.
+3. The chunks go to whatever consumes the generator, e.g. `index_documents`.
+
+At most `depth` pages are extracted ahead of the consumer, so when embedding is the
+bottleneck the workers wait instead of piling up pages, and memory is bounded by the
+pipeline depth rather than the size of the document.
+
+Pages match the ones `PyPDFLoader` produces, metadata included, so the chunks keep
+the same ids in the index.
+
+Used by `4_rag.ipynb`.
+"""
+
+import os
+from collections import deque
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Any, BinaryIO, Iterator
+
+import pypdf
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+_file: BinaryIO | None = None
+_reader: pypdf.PdfReader | None = None
+_metadata: dict[str, Any] = {}
+
+# Keys that other PDF parsers name differently, kept under both names
+_METADATA_ALIASES = {"page_count": "total_pages", "file_path": "source"}
+
+
+def _normalize_metadata(metadata: dict[str, Any]) -> dict[str, Any]:
+    """``metadata`` with the key names and values `PyPDFLoader` gives its pages."""
+    normalized: dict[str, Any] = {}
+    for key, value in metadata.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = key.removeprefix("/").lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(
+                    value.replace("'", ""), "D:%Y%m%d%H%M%S%z"
+                ).isoformat("T")
+            except ValueError:
+                pass
+            normalized[key] = value
+        elif key in _METADATA_ALIASES:
+            normalized[_METADATA_ALIASES[key]] = value
+            normalized[key] = value
+        elif isinstance(value, str):
+            normalized[key] = value.strip()
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def _open_pdf(path: str) -> None:
+    global _file, _reader, _metadata
+    # Reading from an open file loads pages on demand, instead of the whole file
+    _file = open(path, "rb")
+    _reader = pypdf.PdfReader(_file)
+    _metadata = _normalize_metadata(
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(_reader.metadata or {})
+        | {"source": path, "total_pages": len(_reader.pages)}
+    )
+
+
+def _extract_page(page_number: int) -> Document:
+    assert _reader is not None
+    return Document(
+        page_content=_reader.pages[page_number].extract_text().strip(),
+        metadata=_metadata
+        | {"page": page_number, "page_label": _reader.page_labels[page_number]},
+    )
+
+
+def extract_pages(
+    path: str, processes: int | None = None, depth: int = 16
+) -> Iterator[Document]:
+    """Yield the pages of the PDF at ``path`` in order, extracted in parallel.
+
+    With ``processes=1`` pages are extracted in this process, which is faster for
+    small files since no workers need to start. By default there's one worker per
+    CPU, but never more than pages.
+    """
+    with open(path, "rb") as f:
+        num_pages = len(pypdf.PdfReader(f).pages)
+    if processes is None:
+        processes = max(1, min(os.cpu_count() or 1, num_pages))
+
+    if processes == 1:
+        _open_pdf(path)
+        try:
+            for page_number in range(num_pages):
+                yield _extract_page(page_number)
+        finally:
+            _file.close()
+        return
+
+    with Pool(processes, initializer=_open_pdf, initargs=(path,)) as pool:
+        pending: deque = deque()
+        next_page = 0
+        while next_page < num_pages or pending:
+            # Keep at most `depth` pages in flight, so the workers never get too far
+            # ahead of the consumer
+            while next_page < num_pages and len(pending) < depth:
+                pending.append(pool.apply_async(_extract_page, (next_page,)))
+                next_page += 1
+            yield pending.popleft().get()
+
+
+def ingest_pdf(
+    path: str,
+    text_splitter: TextSplitter,
+    processes: int | None = None,
+    depth: int = 16,
+) -> Iterator[Document]:
+    """Yield the chunks of the PDF at ``path``, splitting each page as it arrives."""
+    for page in extract_pages(path, processes, depth):
+        yield from text_splitter.split_documents([page])
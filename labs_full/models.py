@@ -0,0 +1,180 @@
+"""Process-wide registry of chat models that share one HTTP connection pool.
+
+Creating a `ChatOpenAI` builds a new OpenAI client with its own httpx connection pool,
+so every new instance pays for new TCP and TLS handshakes, and every
+`with_structured_output` call converts the schema again. The registry hands out one
+instance per set of parameters instead:
+
+- `get_model(model, **params)` returns a cached `ChatOpenAI`. Every model shares the
+  same keep-alive httpx clients, so connections are reused across models too.
+- `get_structured_model(schema, model, **params)` returns a cached
+  `with_structured_output` runnable for that model and schema.
+
+Async connections belong to the event loop that opened them, and scripts may call
+`asyncio.run` several times, so the shared async client sends through a separate
+client per running loop, closed when that loop shuts down.
+
+`registry_stats` counts the instances that were reused instead of created, and the
+requests that reused an open connection instead of opening a new one.
+"""
+
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+DEFAULT_MODEL = "gpt-4.1-mini"
+
+LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=60
+)
+
+
+@dataclass
+class RegistryStats:
+    """Counters of the model registry."""
+
+    models_created: int = 0
+    models_reused: int = 0
+    structured_created: int = 0
+    structured_reused: int = 0
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def handshakes_avoided(self) -> int:
+        """Requests sent over an already open connection."""
+        return self.requests - self.connections
+
+
+registry_stats = RegistryStats()
+
+_lock = threading.Lock()
+_models: dict[tuple, ChatOpenAI] = {}
+_structured: dict[tuple, Runnable] = {}
+_clients: dict[str, Any] = {}
+# httpx exposes the connection a response came from, so new ones can be counted
+_connections: weakref.WeakSet = weakref.WeakSet()
+
+
+def _track(response: httpx.Response) -> None:
+    stream = response.extensions.get("network_stream")
+    with _lock:
+        registry_stats.requests += 1
+        if stream is not None and stream not in _connections:
+            _connections.add(stream)
+            registry_stats.connections += 1
+
+
+async def _atrack(response: httpx.Response) -> None:
+    _track(response)
+
+
+class LoopAsyncClient(DefaultAsyncHttpxClient):
+    """Async client that sends each request through a client of the running loop."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._kwargs = kwargs
+        self._loop_lock = threading.Lock()
+        # loop -> (client, generator that closes it)
+        self._loop_clients: dict[asyncio.AbstractEventLoop, tuple] = {}
+
+    async def _close_with_loop(
+        self, loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient
+    ) -> AsyncIterator[None]:
+        # Once started, the loop finalizes this generator when `asyncio.run` shuts it
+        # down, which closes the client while its loop is still running
+        try:
+            yield
+        finally:
+            with self._loop_lock:
+                self._loop_clients.pop(loop, None)
+            await client.aclose()
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            entry = self._loop_clients.get(loop)
+            if entry is None:
+                client = DefaultAsyncHttpxClient(**self._kwargs)
+                closer = self._close_with_loop(loop, client)
+                entry = self._loop_clients[loop] = (client, closer)
+                start = True
+            else:
+                start = False
+        if start:
+            await anext(entry[1])
+        return await entry[0].send(request, **kwargs)
+
+
+def _http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    # Called with _lock held
+    if not _clients:
+        _clients["sync"] = DefaultHttpxClient(
+            limits=LIMITS, event_hooks={"response": [_track]}
+        )
+        _clients["async"] = LoopAsyncClient(
+            limits=LIMITS, event_hooks={"response": [_atrack]}
+        )
+    return _clients["sync"], _clients["async"]
+
+
+def _key(model: str, params: dict[str, Any]) -> tuple:
+    return (model, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+
+def get_model(model: str = DEFAULT_MODEL, **params: Any) -> ChatOpenAI:
+    """Return the shared `ChatOpenAI` for ``model`` and ``params``."""
+    key = _key(model, params)
+    with _lock:
+        if key in _models:
+            registry_stats.models_reused += 1
+            return _models[key]
+        http_client, http_async_client = _http_clients()
+        instance = ChatOpenAI(
+            model=model,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            **params,
+        )
+        _models[key] = instance
+        registry_stats.models_created += 1
+        return instance
+
+
+def get_structured_model(
+    schema: Any, model: str = DEFAULT_MODEL, **params: Any
+) -> Runnable:
+    """Return the shared ``with_structured_output(schema)`` runnable for a model."""
+    key = (_key(model, params), schema)
+    with _lock:
+        if key in _structured:
+            registry_stats.structured_reused += 1
+            return _structured[key]
+    runnable = get_model(model, **params).with_structured_output(schema)
+    with _lock:
+        if key in _structured:
+            registry_stats.structured_reused += 1
+            return _structured[key]
+        _structured[key] = runnable
+        registry_stats.structured_created += 1
+        return runnable
+
+
+def reset_models() -> None:
+    """Drop every model and HTTP client.
+
+    Forked worker processes must call this before their first request, since
+    connections inherited from the parent can't be shared.
+    """
+    with _lock:
+        _models.clear()
+        _structured.clear()
+        _clients.clear()
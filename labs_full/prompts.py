@@ -0,0 +1,130 @@
+"""Precompiled Jinja2 prompt templates for the research agent.
+
+The graph's nodes used to open, read and parse a template file on every call, once
+per turn and per analyst. `PromptRegistry` loads and compiles every `*.jinja2` file
+of a directory once, and `render(name, **variables)` only fills in the variables of
+the call. Templates without variables are rendered once and reused.
+
+Templates are rendered the same way as
+`PromptTemplate.from_template(..., template_format="jinja2")`, in Jinja2's sandboxed
+environment.
+
+With ``watch=True`` (for development), `render` checks the files' modification times
+at most every ``poll_interval`` seconds, and recompiles the templates that changed, so
+edits show up without restarting the kernel.
+
+The time spent rendering each template is recorded, see `report`.
+
+Used by `15_complex_agent.ipynb`.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from jinja2 import Template
+from jinja2.sandbox import SandboxedEnvironment
+
+
+@dataclass
+class RenderTiming:
+    """Time spent rendering one template, in seconds."""
+
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+@dataclass
+class CompiledPrompt:
+    """A template and the modification time of its file."""
+
+    template: Template
+    mtime: int
+    # Rendered text of templates without variables
+    static: str | None = None
+
+
+class PromptRegistry:
+    """The compiled templates of a directory, by file name without extension."""
+
+    def __init__(
+        self, directory: str | Path, watch: bool = False, poll_interval: float = 1.0
+    ):
+        self.directory = Path(directory)
+        self.watch = watch
+        self.poll_interval = poll_interval
+        self.timings: dict[str, RenderTiming] = {}
+        # Reloads since the registry was created
+        self.reloads = 0
+        self._environment = SandboxedEnvironment()
+        self._lock = threading.Lock()
+        self._prompts: dict[str, CompiledPrompt] = {}
+        self._last_check = time.monotonic()
+        self._load()
+
+    def _compile(self, path: Path) -> CompiledPrompt:
+        mtime = path.stat().st_mtime_ns
+        source = path.read_text()
+        template = self._environment.from_string(source)
+        static = None
+        if "{{" not in source and "{%" not in source:
+            static = template.render()
+        return CompiledPrompt(template, mtime, static)
+
+    def _load(self) -> None:
+        prompts = {}
+        for path in sorted(self.directory.glob("*.jinja2")):
+            prompt = self._prompts.get(path.stem)
+            if prompt is None or prompt.mtime != path.stat().st_mtime_ns:
+                prompt = self._compile(path)
+                if path.stem in self._prompts:
+                    self.reloads += 1
+            prompts[path.stem] = prompt
+        self._prompts = prompts
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.poll_interval:
+            return
+        with self._lock:
+            if now - self._last_check >= self.poll_interval:
+                self._load()
+                self._last_check = now
+
+    def names(self) -> list[str]:
+        """Names of the loaded templates."""
+        return list(self._prompts)
+
+    def render(self, name: str, **variables: Any) -> str:
+        """Render template ``name`` with ``variables``."""
+        if self.watch:
+            self._check()
+        start = time.perf_counter()
+        prompt = self._prompts[name]
+        if prompt.static is not None and not variables:
+            text = prompt.static
+        else:
+            text = prompt.template.render(**variables)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            timing = self.timings.setdefault(name, RenderTiming())
+            timing.calls += 1
+            timing.total += elapsed
+            timing.max = max(timing.max, elapsed)
+        return text
+
+    def report(self) -> str:
+        """Table of renders and time spent rendering per template."""
+        lines = [f"{'template':<36} {'calls':>5} {'total':>9} {'avg':>9} {'max':>9}"]
+        with self._lock:
+            timings = sorted(self.timings.items(), key=lambda item: -item[1].total)
+            for name, t in timings:
+                lines.append(
+                    f"{name:<36} {t.calls:>5} {t.total * 1000:>7.2f}ms "
+                    f"{t.total / t.calls * 1000:>7.3f}ms {t.max * 1000:>7.3f}ms"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,308 @@
+"""Hybrid lexical and vector retrieval over a Chroma collection.
+
+`HybridRetriever.search` runs two searches over the same chunks:
+
+- A BM25 search on a local inverted index, which finds exact terms such as product
+  names or limits that embeddings tend to blur.
+- The collection's vector search.
+
+The two rankings are merged with reciprocal-rank fusion (each chunk scores
+`1 / (rrf_k + rank)` in each ranking it appears in). A reranker, `lexical_rerank` or a
+local `cross_encoder`, can then rescore the fused candidates. Its scores are blended
+with the fused ones (`rerank_weight`), so they adjust the fused order rather than
+replace it.
+
+The BM25 index is built from the collection on first use, and rebuilt when
+`index_documents` changes the collection.
+
+Repeated queries are served from two in-memory LRU caches:
+
+- Query embeddings, keyed by the normalized query, so asking the same question again
+  (up to case, spacing and trailing punctuation) skips the embedding round-trip. This
+  needs the collection's embedding function, passed as ``embedding_function``;
+  without it, the collection embeds every query itself.
+- Results, keyed by the query embedding and the collection version, so they're
+  dropped as soon as the collection is re-indexed. Without ``embedding_function``,
+  the normalized query stands in for the embedding.
+
+Used by `4_rag.ipynb`.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+from chromadb import Collection, EmbeddingFunction
+from indexing import collection_version
+
+# Scores each text for a query, higher is more relevant
+Reranker = Callable[[str, list[str]], list[float]]
+
+_TOKEN = re.compile(r"\w+")
+
+# Words that match almost every chunk and say nothing about relevance
+STOPWORDS = frozenset(
+    "a about an and are as at be by can could do does for from had has have how i if "
+    "in is it its me my of on or should so that the their there these this to was "
+    "we what when where which who why will with would you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens of ``text``."""
+    return _TOKEN.findall(text.lower())
+
+
+def normalize_query(query: str) -> str:
+    """``query`` casefolded, with single spaces and no trailing punctuation."""
+    return " ".join(query.split()).rstrip("?!. ").casefold()
+
+
+@dataclass
+class RetrievalStats:
+    """Counters of a `HybridRetriever`."""
+
+    queries: int = 0
+    # Queries whose embedding was cached
+    embedding_hits: int = 0
+    # Queries whose results were cached for the current collection version
+    result_hits: int = 0
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index."""
+
+    def __init__(
+        self, ids: list[str], texts: list[str], k1: float = 1.5, b: float = 0.75
+    ):
+        self.ids = ids
+        self.k1 = k1
+        self.b = b
+        # term -> [(document position, term frequency)]
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self.lengths = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                self.postings[term].append((i, count))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if texts else 0.0
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """Top ``k`` ``(id, score)`` pairs for ``query``."""
+        scores: dict[int, float] = defaultdict(float)
+        n = len(self.ids)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, count in postings:
+                norm = 1 - self.b + self.b * self.lengths[i] / self.avg_length
+                scores[i] += idf * count * (self.k1 + 1) / (count + self.k1 * norm)
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[i], score) for i, score in top]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[str]], rrf_k: int = 60
+) -> list[tuple[str, float]]:
+    """Merge ranked lists of ids, best first."""
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] += 1 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def lexical_rerank(query: str, texts: list[str]) -> list[float]:
+    """Score texts by the query terms they contain, and the exact phrase.
+
+    Stopwords are ignored, and each term is weighted by its BM25 IDF over ``texts``, so
+    terms that only a few candidates contain count the most.
+    """
+    terms = set(tokenize(query)) - STOPWORDS
+    phrase = " ".join(tokenize(query))
+    documents = [tokenize(text) for text in texts]
+    term_sets = [set(tokens) for tokens in documents]
+    n = len(texts)
+    idf = {}
+    for term in terms:
+        df = sum(term in tokens for tokens in term_sets)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    total = sum(idf.values())
+
+    scores = []
+    for tokens, token_set in zip(documents, term_sets):
+        matched = sum(idf[term] for term in terms & token_set)
+        coverage = matched / total if total else 0.0
+        scores.append(
+            coverage + (0.5 if phrase and phrase in " ".join(tokens) else 0.0)
+        )
+    return scores
+
+
+def _min_max(scores: list[float]) -> list[float]:
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [0.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+
+def cross_encoder(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2") -> Reranker:
+    """Reranker that scores query and text pairs with a local cross-encoder.
+
+    Needs `sentence-transformers`, which isn't a dependency of the workshop.
+    """
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        raise ImportError(
+            "cross_encoder needs sentence-transformers, install it with "
+            "`uv add sentence-transformers`"
+        )
+
+    model = CrossEncoder(model_name)
+
+    def rerank(query: str, texts: list[str]) -> list[float]:
+        return [float(score) for score in model.predict([(query, t) for t in texts])]
+
+    return rerank
+
+
+class HybridRetriever:
+    """BM25 and vector search over a collection, fused and optionally reranked."""
+
+    def __init__(
+        self,
+        collection: Collection,
+        embedding_function: EmbeddingFunction | None = None,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        reranker: Reranker | None = None,
+        rerank_weight: float = 0.5,
+        manifest: str | Path | None = None,
+        cache_size: int = 1024,
+    ):
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_weight = rerank_weight
+        self.manifest = manifest
+        self.cache_size = cache_size
+        self.stats = RetrievalStats()
+        self._version: int | None = None
+        self._bm25: BM25Index | None = None
+        self._chunks: dict[str, tuple[str, dict[str, Any]]] = {}
+        self._embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._results: OrderedDict[tuple, list[str]] = OrderedDict()
+
+    def _cached(self, cache: OrderedDict, key: Any) -> Any:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        return None
+
+    def _store(self, cache: OrderedDict, key: Any, value: Any) -> None:
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _lexical_index(self) -> BM25Index:
+        version = collection_version(self.collection, self.manifest)
+        if self._bm25 is None or version != self._version:
+            records = self.collection.get(include=["documents", "metadatas"])
+            self._chunks = {
+                id: (text, metadata or {})
+                for id, text, metadata in zip(
+                    records["ids"], records["documents"], records["metadatas"]
+                )
+            }
+            self._bm25 = BM25Index(records["ids"], records["documents"])
+            self._version = version
+            # Results of older versions can't be hit anymore
+            self._results.clear()
+        return self._bm25
+
+    def _embed(self, query: str) -> np.ndarray:
+        assert self.embedding_function is not None
+        key = normalize_query(query)
+        embedding = self._cached(self._embeddings, key)
+        if embedding is not None:
+            self.stats.embedding_hits += 1
+            return embedding
+        embedding = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+        self._store(self._embeddings, key, embedding)
+        return embedding
+
+    def _vector_search(self, query: str, embedding: np.ndarray | None) -> list[str]:
+        n_results = min(self.candidates, max(self.collection.count(), 1))
+        if embedding is None:
+            return self.collection.query(
+                query_texts=[query], n_results=n_results, include=[]
+            )["ids"][0]
+        return self.collection.query(
+            query_embeddings=[embedding], n_results=n_results, include=[]
+        )["ids"][0]
+
+    def _rank(
+        self, query: str, embedding: np.ndarray | None, bm25: BM25Index
+    ) -> list[str]:
+        lexical = [id for id, _ in bm25.search(query, self.candidates)]
+        vector = self._vector_search(query, embedding)
+
+        fused = [
+            (id, score)
+            for id, score in reciprocal_rank_fusion([lexical, vector], self.rrf_k)
+            if id in self._chunks
+        ][: self.candidates]
+        ids = [id for id, _ in fused]
+        if self.reranker is not None and ids:
+            rerank_scores = self.reranker(query, [self._chunks[id][0] for id in ids])
+            scores = [
+                (1 - self.rerank_weight) * fused_score
+                + self.rerank_weight * rerank_score
+                for fused_score, rerank_score in zip(
+                    _min_max([score for _, score in fused]), _min_max(rerank_scores)
+                )
+            ]
+            # Sorting is stable, so ties keep their fused order
+            order = sorted(range(len(ids)), key=lambda i: scores[i], reverse=True)
+            ids = [ids[i] for i in order]
+        return ids
+
+    def search(self, query: str, n_results: int = 3) -> list[dict[str, Any]]:
+        """Return the ``n_results`` most relevant chunks for ``query``."""
+        self.stats.queries += 1
+        bm25 = self._lexical_index()
+
+        embedding = None
+        if self.embedding_function is None:
+            query_key = normalize_query(query)
+        else:
+            embedding = self._embed(query)
+            query_key = hashlib.sha256(embedding.tobytes()).hexdigest()
+        key = (query_key, self._version, n_results)
+        ids = self._cached(self._results, key)
+        if ids is None:
+            ids = self._rank(query, embedding, bm25)[:n_results]
+            self._store(self._results, key, ids)
+        else:
+            self.stats.result_hits += 1
+
+        return [
+            {
+                "id": id,
+                "page_content": self._chunks[id][0],
+                "type": "Document",
+                "metadata": self._chunks[id][1],
+            }
+            for id in ids
+        ]
@@ -0,0 +1,161 @@
+"""Load test for the sample app graph and its FastHTML routes.
+
+Two targets are available:
+
+- `graph`: compiles `react_agent.graph` in-process and runs it directly.
+- `routes`: drives a running server (`langgraph dev`) through the same requests the
+  browser makes: open the conversation page, `send_message`, then the streamed
+  (`stream-ai-response`) or buffered (`get-ai-response`) AI response.
+
+Point the agent at the local stub (`bench/mock_openai.py`) for offline, reproducible
+numbers:
+
+    python bench/mock_openai.py --script bench/react_script.json &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock \\
+        python bench/load_test.py graph --requests 200 --concurrency 20
+
+Reports throughput and p50/p95/p99 latency.
+"""
+
+import argparse
+import asyncio
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+
+PROMPT = "What is 2 + 2? Use python to compute it."
+
+
+@dataclass
+class Results:
+    """Latencies in seconds, keyed by metric name."""
+
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, metric: str, seconds: float) -> None:
+        """Record one latency sample."""
+        self.latencies.setdefault(metric, []).append(seconds)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def report(results: Results, requests: int, elapsed: float) -> None:
+    """Print throughput and latency percentiles."""
+    print(f"requests: {requests}  errors: {results.errors}  wall: {elapsed:.2f}s")
+    print(f"throughput: {(requests - results.errors) / elapsed:.2f} req/s")
+    print(f"{'metric':<12}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for metric, values in results.latencies.items():
+        p50, p95, p99 = (percentile(values, p) * 1000 for p in (50, 95, 99))
+        print(f"{metric:<12}{len(values):>6}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+async def run_load(requests: int, concurrency: int, one_request) -> None:
+    """Run ``one_request`` ``requests`` times with at most ``concurrency`` in flight."""
+    results = Results()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(i: int):
+        async with semaphore:
+            try:
+                await one_request(i, results)
+            except Exception as e:
+                results.errors += 1
+                print(f"request {i} failed: {e!r}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(requests)])
+    report(results, requests, time.perf_counter() - start)
+
+
+async def load_graph(args) -> None:
+    """Run the agent graph in-process."""
+    from react_agent.graph import graph
+
+    agent = graph.compile()
+
+    async def one_request(i: int, results: Results):
+        start = time.perf_counter()
+        await agent.ainvoke({"messages": [{"type": "human", "content": PROMPT}]})
+        results.record("run", time.perf_counter() - start)
+
+    await run_load(args.requests, args.concurrency, one_request)
+
+
+async def load_routes(args) -> None:
+    """Drive the FastHTML routes of a running server."""
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+
+        async def one_request(i: int, results: Results):
+            thread_id = str(uuid.uuid4())
+            cookies = {"user_id": f"load-test-{i % args.users}"}
+            start = time.perf_counter()
+
+            # The page creates the thread the message is sent to
+            page = await client.get(f"/conversations/{thread_id}", cookies=cookies)
+            page.raise_for_status()
+            results.record("page", time.perf_counter() - start)
+
+            sent = time.perf_counter()
+            response = await client.post(
+                f"/conversations/{thread_id}/send-message",
+                data={"msg": PROMPT},
+                cookies=cookies,
+                headers={"HX-Request": "true"},
+            )
+            response.raise_for_status()
+            results.record("send", time.perf_counter() - sent)
+            typing_id = re.search(r'id="typing-([0-9a-f-]+)"', response.text).group(1)
+
+            if args.buffered:
+                answer = await client.get(
+                    f"/conversations/get-ai-response/{typing_id}",
+                    headers={"HX-Request": "true"},
+                )
+                answer.raise_for_status()
+            else:
+                first_byte = None
+                async with client.stream(
+                    "GET", f"/conversations/stream-ai-response/{typing_id}"
+                ) as stream:
+                    async for line in stream.aiter_lines():
+                        if first_byte is None and line.startswith("data:"):
+                            first_byte = time.perf_counter()
+                            results.record("ttfb", first_byte - sent)
+                        if line.startswith("event: close"):
+                            break
+            results.record("response", time.perf_counter() - sent)
+            results.record("total", time.perf_counter() - start)
+
+        await run_load(args.requests, args.concurrency, one_request)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("target", choices=["graph", "routes"])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--url", default="http://127.0.0.1:2024")
+    parser.add_argument("--users", type=int, default=5, help="distinct user cookies")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--buffered", action="store_true", help="use get-ai-response instead of SSE"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(load_graph(args) if args.target == "graph" else load_routes(args))
+
+
+if __name__ == "__main__":
+    main()
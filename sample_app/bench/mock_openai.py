@@ -0,0 +1,295 @@
+"""Local OpenAI-compatible stub for offline, reproducible benchmarks.
+
+Serves `/v1/chat/completions` (streaming and non-streaming, tool calls and structured
+output) and `/v1/embeddings` with configurable latency and token rate. Replies can be
+scripted per step of a ReAct turn with a JSON file, for example:
+
+    [
+        {"tool_calls": [{"name": "run_python_code", "arguments": {"code": "print(2 + 2)"}}]},
+        {"content": "The result is 4."}
+    ]
+
+Step N of the script answers the request with N assistant messages after the last user
+message. Requests past the end of the script get a plain text reply.
+
+Run it and point any OpenAI client at it:
+
+    python bench/mock_openai.py --port 8100 --latency 0.3 --tokens-per-second 80
+    export OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import time
+import uuid
+from array import array
+from dataclasses import dataclass, field
+from typing import Any
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+@dataclass
+class MockConfig:
+    """How the stub answers."""
+
+    # Seconds before the first token
+    latency: float = 0.2
+    # Output rate once generation starts, 0 for no delay
+    tokens_per_second: float = 100.0
+    # Length of the default text reply
+    output_tokens: int = 50
+    # Seconds per embeddings request
+    embedding_latency: float = 0.05
+    embedding_dimensions: int = 1536
+    script: list[dict[str, Any]] = field(default_factory=list)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count, about four characters per token."""
+    return max(1, len(json.dumps(value)) // 4)
+
+
+def example_from_schema(schema: dict, defs: dict | None = None) -> Any:
+    """Build a value that validates against a (simple) JSON schema."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"]
+            return example_from_schema(options[0] if options else {}, defs)
+
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        return {
+            name: example_from_schema(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [example_from_schema(schema.get("items", {}), defs)]
+    if schema_type == "boolean":
+        return True
+    if schema_type == "integer":
+        return 0
+    if schema_type == "number":
+        return 0.0
+    return "mock"
+
+
+def plan_reply(body: dict, config: MockConfig) -> tuple[str, list[dict]]:
+    """Decide the text content and tool calls of the reply."""
+    messages = body.get("messages", [])
+    last_user = max(
+        (i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1
+    )
+    step = sum(1 for m in messages[last_user + 1 :] if m.get("role") == "assistant")
+
+    # Structured output, either through a forced tool or a JSON schema
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(example_from_schema(schema)), []
+    tool_choice = body.get("tool_choice")
+    if isinstance(tool_choice, dict) and "function" in tool_choice:
+        name = tool_choice["function"]["name"]
+        tool = next(t for t in body["tools"] if t["function"]["name"] == name)
+        arguments = example_from_schema(tool["function"].get("parameters", {}))
+        return "", [{"name": name, "arguments": arguments}]
+
+    if body.get("tools") and step < len(config.script):
+        scripted = config.script[step]
+        return scripted.get("content", ""), scripted.get("tool_calls", [])
+    if step < len(config.script) and "content" in config.script[step]:
+        return config.script[step]["content"], []
+
+    return " ".join(["mock"] * config.output_tokens), []
+
+
+def split_tokens(content: str) -> list[str]:
+    """Split text into token-sized pieces that join back to the original."""
+    words = content.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)] if content else []
+
+
+def usage(body: dict, content: str, tool_calls: list[dict]) -> dict:
+    """Build the usage block of a response."""
+    prompt_tokens = estimate_tokens(body.get("messages", []))
+    completion_tokens = len(split_tokens(content)) + sum(
+        estimate_tokens(call) for call in tool_calls
+    )
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def openai_tool_calls(tool_calls: list[dict]) -> list[dict]:
+    """Convert scripted tool calls to the OpenAI wire format."""
+    return [
+        {
+            "index": i,
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {
+                "name": call["name"],
+                "arguments": json.dumps(call.get("arguments", {})),
+            },
+        }
+        for i, call in enumerate(tool_calls)
+    ]
+
+
+def build_app(config: MockConfig) -> Starlette:
+    """Build the stub application."""
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        content, tool_calls = plan_reply(body, config)
+        calls = openai_tool_calls(tool_calls)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+        finish_reason = "tool_calls" if calls else "stop"
+        delay = 1 / config.tokens_per_second if config.tokens_per_second else 0
+
+        await asyncio.sleep(config.latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay * len(split_tokens(content)))
+            message: dict[str, Any] = {"role": "assistant", "content": content or None}
+            if calls:
+                message["tool_calls"] = [
+                    {k: v for k, v in call.items() if k != "index"} for call in calls
+                ]
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": finish_reason}
+                    ],
+                    "usage": usage(body, content, tool_calls),
+                }
+            )
+
+        def chunk(delta: dict, finish: str | None = None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in split_tokens(content):
+                yield chunk({"content": token})
+                await asyncio.sleep(delay)
+            if calls:
+                yield chunk({"tool_calls": calls})
+            yield chunk({}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage(body, content, tool_calls),
+                }
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or config.embedding_dimensions
+        await asyncio.sleep(config.embedding_latency)
+        data = []
+        for i, text in enumerate(inputs):
+            vector: Any = embed(text, dimensions)
+            # The openai client asks for base64-encoded float32 by default
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array("f", vector).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "mock"),
+                "usage": {
+                    "prompt_tokens": estimate_tokens(inputs),
+                    "total_tokens": estimate_tokens(inputs),
+                },
+            }
+        )
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/embeddings", embeddings, methods=["POST"]),
+        ]
+    )
+
+
+def embed(text: Any, dimensions: int) -> list[float]:
+    """Deterministic unit-length pseudo-embedding of ``text``."""
+    seed = hashlib.sha256(json.dumps(text).encode()).digest()
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        block = hashlib.sha256(seed + counter.to_bytes(4, "little")).digest()
+        values.extend((b - 127.5) / 127.5 for b in block)
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values))
+    return [v / norm for v in values]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--output-tokens", type=int, default=50)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--script", help="JSON file with the replies of each step")
+    args = parser.parse_args()
+
+    script = []
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+
+    config = MockConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        embedding_latency=args.embedding_latency,
+        script=script,
+    )
+    uvicorn.run(build_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,31 +12,62 @@ to show that you can add custom routes to a langgraph deployment so you can do t
 stream responses or add a custom UI.
 """
 
+import asyncio
+import logging
+import os
+import time
 import uuid
-from typing import Dict
+from typing import Awaitable, Dict, TypeVar
 
 from fasthtml.common import (  # type: ignore
     H2,
     A,
     Button,
     Div,
+    EventStream,
     FastHTML,
     Form,
+    HttpHeader,
     Input,
     Link,
     Script,
+    Span,
     Title,
     picolink,
+    sse_message,
 )
 from fasthtml.core import Request  # type: ignore
 from langgraph_sdk import get_client
 from starlette.responses import RedirectResponse
 
+from react_agent.cache import get_sidebar_cache
+from react_agent.registry import get_run_registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 # Initialize the LangGraph client
 langgraph_client = get_client()
 
-# Dictionary to track ongoing AI requests
-ongoing_requests: Dict[str, Dict] = {}
+# Under the `http.app` mount, the client above talks to the server in-process, and
+# that transport buffers each response until it's complete. The streaming route
+# joins runs over HTTP instead, so tokens reach the browser as they're generated.
+LANGGRAPH_API_URL = os.getenv("LANGGRAPH_API_URL", "http://127.0.0.1:2024")
+stream_client = get_client(url=LANGGRAPH_API_URL)
+
+# Registry to track ongoing AI requests, shared across workers if configured
+run_registry = get_run_registry()
+
+# Per-user cache of the sidebar thread list
+sidebar_cache = get_sidebar_cache()
+
+# Number of turns (human messages and everything after them) rendered per history page
+HISTORY_TURNS = int(os.getenv("HISTORY_TURNS", "10"))
+
+# Stream tokens, tool calls and tool results as they arrive instead of waiting
+# for the whole run to finish
+STREAM_TOKENS = os.getenv("STREAM_TOKENS", "true").lower() in ("1", "true", "yes")
 
 # Define HTML headers for styling and client-side functionality
 tlink = (Script(src="https://cdn.tailwindcss.com"),)
@@ -268,7 +299,26 @@ fonts = Link(
     rel="stylesheet",
     href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600&display=swap",
 )
-app = FastHTML(hdrs=(tlink, dlink, picolink, custom_styles, fonts), live=True)
+# htmx SSE extension used to stream AI responses
+sselink = Script(src="https://cdn.jsdelivr.net/npm/htmx-ext-sse@2.2.2/sse.js")
+app = FastHTML(hdrs=(tlink, dlink, picolink, custom_styles, fonts, sselink), live=True)
+
+
+async def timed(name: str, timings: Dict[str, float], coro: Awaitable[T]) -> T:
+    """Await ``coro`` and record how long it took, in milliseconds, under ``name``."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+def server_timing(timings: Dict[str, float]) -> HttpHeader:
+    """Build a ``Server-Timing`` header from the recorded timings."""
+    return HttpHeader(
+        "Server-Timing",
+        ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items()),
+    )
 
 
 def get_user_id(request: Request) -> str:
@@ -394,8 +444,21 @@ def ToolResultMessage(tool_result: str, tool_call_id: str, idx: str | int) -> Di
     )
 
 
-def TypingIndicator(typing_id: str) -> Div:
-    """Render a typing indicator for when AI is thinking."""
+def TypingIndicator(typing_id: str, poll: bool = True) -> Div:
+    """Render a typing indicator for when AI is thinking.
+
+    When ``poll`` is set, the indicator fetches the full AI response on load and
+    replaces itself with it.
+    """
+    poll_attrs = (
+        {
+            "hx_get": f"/conversations/get-ai-response/{typing_id}",
+            "hx_trigger": "load delay:100ms",
+            "hx_swap": "outerHTML",
+        }
+        if poll
+        else {}
+    )
     return Div(
         Div(
             Div(
@@ -421,20 +484,37 @@ def TypingIndicator(typing_id: str) -> Div:
         ),
         id=f"typing-{typing_id}",
         cls="py-2 flex justify-start",
-        hx_get=f"/conversations/get-ai-response/{typing_id}",
-        hx_trigger="load delay:100ms",
-        hx_swap="outerHTML",
+        **poll_attrs,
+    )
+
+
+def StreamingResponse(typing_id: str) -> Div:
+    """Render a container that streams the AI response over SSE.
+
+    Every fragment sent by ``stream_ai_response`` is appended to this container, so
+    tokens, tool calls and tool results show up as soon as they are produced.
+    """
+    return Div(
+        TypingIndicator(typing_id, poll=False),
+        id=f"stream-{typing_id}",
+        hx_ext="sse",
+        sse_connect=f"/conversations/stream-ai-response/{typing_id}",
+        sse_swap="message",
+        sse_close="close",
+        hx_swap="beforeend",
     )
 
 
-def render_message_history(messages):
-    """Render the complete message history from thread state.
+def render_message_history(messages, start: int = 0):
+    """Render the message history from thread state.
 
     Processes different message types from LangGraph and returns appropriate UI components.
+    ``start`` is the position of the first message in the thread, to keep ids unique
+    when rendering a slice of the history.
     """
     rendered_messages = []
 
-    for i, msg in enumerate(messages):
+    for i, msg in enumerate(messages, start=start):
         msg_id = f"history-{i}"
 
         # Handle different message types from LangGraph
@@ -483,6 +563,63 @@ def render_message_history(messages):
     return rendered_messages
 
 
+def messages_from_state(state: Dict) -> list:
+    """Extract the messages from a thread state."""
+    values = state["values"]
+    if isinstance(values, list):
+        return values[-1]["messages"]
+    return values["messages"]
+
+
+def history_start(messages: list, end: int, turns: int = HISTORY_TURNS) -> int:
+    """Find where the page of ``turns`` turns ending right before ``end`` starts."""
+    seen = 0
+    for i in range(end - 1, -1, -1):
+        msg = messages[i]
+        msg_type = msg.type if hasattr(msg, "type") else msg.get("type")
+        if msg_type == "human":
+            seen += 1
+            if seen == turns:
+                return i
+    return 0
+
+
+def LoadEarlierButton(thread_id: str, before: int, checkpoint_id: str | None) -> Div:
+    """Render a button that loads the page of history before ``before``.
+
+    The checkpoint id pins the state the page was rendered from, so indices stay
+    consistent while new messages are added to the thread.
+    """
+    url = f"/conversations/{thread_id}/history?before={before}"
+    if checkpoint_id:
+        url += f"&checkpoint_id={checkpoint_id}"
+    return Div(
+        Button(
+            "Load earlier messages",
+            cls="px-4 py-1.5 text-sm text-gray-600 bg-white border border-gray-200 rounded-full shadow-sm hover:bg-gray-100",
+            hx_get=url,
+            hx_target="#load-earlier",
+            hx_swap="outerHTML",
+        ),
+        id="load-earlier",
+        cls="py-2 flex justify-center",
+    )
+
+
+def render_history_page(
+    thread_id: str, messages: list, end: int, checkpoint_id: str | None
+) -> list:
+    """Render the page of history ending right before ``end``.
+
+    The page is preceded by a "load earlier" button if there are older messages.
+    """
+    start = history_start(messages, end)
+    components = render_message_history(messages[start:end], start=start)
+    if start > 0:
+        components.insert(0, LoadEarlierButton(thread_id, start, checkpoint_id))
+    return components
+
+
 def ChatInputBubble(thread_id: str) -> Div:
     """Clean chatbot input."""
     return Div(
@@ -543,13 +680,21 @@ def ChatInputBubble(thread_id: str) -> Div:
 async def ConversationList(user_id: str, current_thread_id: str) -> Div:
     """Render the sidebar list of conversations.
 
-    Shows all threads for the user with the current thread highlighted.
+    Shows all threads for the user with the current thread highlighted. The thread
+    list and the rendered sidebar are cached per user for a short TTL.
     """
-    threads = await langgraph_client.threads.search(
-        metadata={"user_id": user_id}, limit=50, offset=0
-    )
-
-    return Div(
+    sidebar = sidebar_cache.get_rendered(user_id, current_thread_id)
+    if sidebar is not None:
+        return sidebar
+
+    threads = sidebar_cache.get_threads(user_id)
+    if threads is None:
+        threads = await langgraph_client.threads.search(
+            metadata={"user_id": user_id}, limit=50, offset=0
+        )
+        sidebar_cache.set_threads(user_id, threads)
+
+    sidebar = Div(
         Div(
             H2("Threads", cls="text-xl font-medium text-langchain-green mb-4"),
             cls="flex items-center h-[69px] px-6 border-b border-gray-200 bg-white/90 sticky top-0 z-10",
@@ -577,6 +722,8 @@ async def ConversationList(user_id: str, current_thread_id: str) -> Div:
         id="sidebar",
         cls="w-80 bg-white border-r border-gray-200 shadow-sm transition-all duration-100 ease-in-out",
     )
+    sidebar_cache.set_rendered(user_id, current_thread_id, sidebar)
+    return sidebar
 
 
 @app.get("/")  # type: ignore
@@ -593,25 +740,51 @@ async def root(request: Request):
 async def conversation(thread_id: str, request: Request):
     """Display the chat interface for a specific conversation.
 
-    Shows message history and handles new message streaming.
+    Shows message history and handles new message streaming. The thread state is
+    fetched concurrently with the sidebar, and the time spent on each upstream call
+    is reported in the ``Server-Timing`` header.
     """
     user_id = get_user_id(request)
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    async def load_sidebar() -> Div:
+        # Create thread with user_id in metadata, unless we already know it exists
+        if not sidebar_cache.is_known_thread(user_id, thread_id):
+            await timed(
+                "create",
+                timings,
+                langgraph_client.threads.create(
+                    thread_id=thread_id,
+                    if_exists="do_nothing",
+                    metadata={"user_id": user_id},
+                ),
+            )
+            # The thread may be new, so the cached sidebar can be stale
+            sidebar_cache.invalidate(user_id)
+            sidebar_cache.add_known_thread(user_id, thread_id)
+        return await timed("sidebar", timings, ConversationList(user_id, thread_id))
+
+    async def load_messages() -> tuple[list, str | None]:
+        # A thread that doesn't exist yet has no messages
+        try:
+            state = await timed(
+                "get_state", timings, langgraph_client.threads.get_state(thread_id)
+            )
+            checkpoint_id = (state.get("checkpoint") or {}).get("checkpoint_id")
+            return messages_from_state(state), checkpoint_id
+        except Exception:
+            return [], None
 
-    # Create thread with user_id in metadata
-    await langgraph_client.threads.create(
-        thread_id=thread_id, if_exists="do_nothing", metadata={"user_id": user_id}
+    sidebar, (messages, checkpoint_id) = await asyncio.gather(
+        load_sidebar(), load_messages()
+    )
+    timings["total"] = (time.perf_counter() - start) * 1000
+    logger.info(
+        "conversation %s upstream timings: %s",
+        thread_id,
+        ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items()),
     )
-
-    # Fetch thread state
-    try:
-        state = await langgraph_client.threads.get_state(thread_id)
-        values = state["values"]
-        if isinstance(values, list):
-            messages = values[-1]["messages"]
-        else:
-            messages = values["messages"]
-    except Exception:
-        messages = []
 
     # Define the "New Thread" button as a regular link
     new_thread_button = A(
@@ -631,7 +804,7 @@ async def conversation(thread_id: str, request: Request):
             cls="flex justify-between items-center py-4 px-6 bg-white border-b border-gray-200 shadow-sm sticky top-0 z-10",
         ),
         Div(
-            *render_message_history(messages),
+            *render_history_page(thread_id, messages, len(messages), checkpoint_id),
             id="chatlist",
             cls="chat-box h-[calc(100vh-10rem)] overflow-y-auto px-6 py-6 bg-gradient-to-br from-purple-50 to-green-50",
         ),
@@ -640,7 +813,7 @@ async def conversation(thread_id: str, request: Request):
     )
 
     page = Div(
-        await ConversationList(user_id, thread_id),
+        sidebar,
         Div(
             "",
             id="sidebar-resizer",
@@ -654,6 +827,25 @@ async def conversation(thread_id: str, request: Request):
             "LangChain Chat Demo",
         ),
         page,
+        server_timing(timings),
+    )
+
+
+@app.get("/conversations/{thread_id}/history")  # type: ignore[misc]
+async def message_history(thread_id: str, before: int, checkpoint_id: str = ""):
+    """Render the page of message history before the given message index."""
+    try:
+        state = await langgraph_client.threads.get_state(
+            thread_id, checkpoint_id=checkpoint_id or None
+        )
+        messages = messages_from_state(state)
+    except Exception as e:
+        return Div(f"Error loading messages: {str(e)}", cls="text-red-500")
+
+    return tuple(
+        render_history_page(
+            thread_id, messages, min(before, len(messages)), checkpoint_id or None
+        )
     )
 
 
@@ -690,22 +882,27 @@ async def send_message(request: Request, thread_id: str):
     user_msg_div = ChatMessage({"type": "human", "content": msg}, user_msg_id)
 
     # Create typing indicator
-    typing_indicator = TypingIndicator(typing_id)
+    typing_indicator = (
+        StreamingResponse(typing_id) if STREAM_TOKENS else TypingIndicator(typing_id)
+    )
 
     # Start AI request in background and store details
     run = await langgraph_client.runs.create(
         thread_id=thread_id,
         assistant_id="agent",
         input={"messages": [{"type": "human", "content": msg}]},
-        stream_mode="updates",
+        stream_mode=["updates", "messages"],
     )
 
     # Store the ongoing request details
-    ongoing_requests[typing_id] = {
-        "thread_id": thread_id,
-        "run_id": run["run_id"],
-        "started": True,
-    }
+    await run_registry.put(
+        typing_id,
+        {
+            "thread_id": thread_id,
+            "run_id": run["run_id"],
+            "started": True,
+        },
+    )
 
     return user_msg_div, typing_indicator
 
@@ -713,10 +910,10 @@ async def send_message(request: Request, thread_id: str):
 @app.get("/conversations/get-ai-response/{typing_id}")  # type: ignore[misc]
 async def get_ai_response(typing_id: str):
     """Get the AI response for a specific typing indicator."""
-    if typing_id not in ongoing_requests:
+    request_info = await run_registry.pop(typing_id)
+    if request_info is None:
         return Div("Error: Request not found", cls="text-red-500")
 
-    request_info = ongoing_requests[typing_id]
     thread_id = request_info["thread_id"]
     run_id = request_info["run_id"]
 
@@ -729,9 +926,6 @@ async def get_ai_response(typing_id: str):
             if chunk.event == "updates":
                 stream_updates.append(chunk.data)
 
-        # Clean up the ongoing request
-        del ongoing_requests[typing_id]
-
         # Extract new messages from the stream updates
         # Updates stream mode gives us the state updates after each node
         new_messages = []
@@ -802,7 +996,117 @@ async def get_ai_response(typing_id: str):
             return Div("No response received", cls="text-gray-500")
 
     except Exception as e:
-        # Clean up on error
-        if typing_id in ongoing_requests:
-            del ongoing_requests[typing_id]
         return Div(f"Error getting response: {str(e)}", cls="text-red-500")
+
+
+def render_stream_messages(
+    messages: list, typing_id: str, seen: Dict[str, Dict]
+) -> list:
+    """Render the new parts of the messages received in a ``messages`` stream event.
+
+    ``seen`` keeps, per message id, its DOM index, how much of its content has been
+    sent and whether its tool calls were rendered, so only deltas are emitted.
+    """
+    components = []
+    for msg in messages:
+        msg_type = msg.get("type", "unknown")
+        if msg_type not in ("ai", "AIMessageChunk", "tool"):
+            continue
+
+        key = msg.get("id") or str(uuid.uuid4())
+        if key not in seen:
+            seen[key] = {
+                "idx": f"stream-{typing_id}-{len(seen)}",
+                "sent": 0,
+                "tools": False,
+            }
+        info = seen[key]
+        msg_id = info["idx"]
+
+        if msg_type == "tool":
+            if not info["tools"]:
+                info["tools"] = True
+                components.append(
+                    ToolResultMessage(
+                        str(msg.get("content", "")),
+                        msg.get("tool_call_id") or "unknown",
+                        msg_id,
+                    )
+                )
+            continue
+
+        content = msg.get("content", "")
+        if isinstance(content, str) and len(content) > info["sent"]:
+            delta = content[info["sent"] :]
+            if info["sent"] == 0:
+                components.append(ChatMessage({"type": "ai", "content": delta}, msg_id))
+            else:
+                components.append(
+                    Span(delta, hx_swap_oob=f"beforeend:#chat-content-{msg_id}")
+                )
+            info["sent"] = len(content)
+
+        # Tool call arguments arrive in fragments, only render them once complete
+        tool_calls = msg.get("tool_calls") or []
+        if tool_calls and not info["tools"] and not msg.get("tool_call_chunks"):
+            info["tools"] = True
+            for j, tool_call in enumerate(tool_calls):
+                components.append(ToolCallMessage(tool_call, f"{msg_id}-tool-{j}"))
+
+    return components
+
+
+@app.get("/conversations/stream-ai-response/{typing_id}")  # type: ignore[misc]
+async def stream_ai_response(typing_id: str):
+    """Stream the AI response for a specific typing indicator as SSE fragments."""
+
+    async def event_stream():
+        request_info = await run_registry.pop(typing_id)
+        if request_info is None:
+            yield sse_message(Div("Error: Request not found", cls="text-red-500"))
+            yield "event: close\ndata: \n\n"
+            return
+
+        thread_id = request_info["thread_id"]
+        run_id = request_info["run_id"]
+
+        # Remove the typing indicator as soon as the first fragment arrives
+        typing_removed = False
+        seen: Dict[str, Dict] = {}
+
+        try:
+            async for chunk in stream_client.runs.join_stream(
+                thread_id, run_id, stream_mode="messages"
+            ):
+                if chunk.event not in ("messages/partial", "messages/complete"):
+                    continue
+
+                components = render_stream_messages(chunk.data, typing_id, seen)
+                if not components:
+                    continue
+
+                if not typing_removed:
+                    typing_removed = True
+                    components.append(
+                        Div(id=f"typing-{typing_id}", hx_swap_oob="delete")
+                    )
+                yield sse_message(Div(*components))
+
+            if not seen:
+                yield sse_message(
+                    Div(
+                        Div("No response received", cls="text-gray-500"),
+                        Div(id=f"typing-{typing_id}", hx_swap_oob="delete"),
+                    )
+                )
+        except Exception as e:
+            yield sse_message(
+                Div(
+                    Div(f"Error getting response: {str(e)}", cls="text-red-500"),
+                    Div(id=f"typing-{typing_id}", hx_swap_oob="delete"),
+                )
+            )
+
+        yield "event: close\ndata: \n\n"
+
+    return EventStream(event_stream())
@@ -0,0 +1,216 @@
+"""Context-window budgeting for long ReAct threads.
+
+The thread keeps its full history (the UI renders it), but the LLM only sees a bounded
+view of it: tool outputs of earlier turns are truncated, and older turns are folded
+into a running summary. A current turn that doesn't fit on its own gets its tool
+outputs truncated too. The `budget` node runs before every `llm_call`, and only when
+the view goes over the token budget does it move the truncation point forward, and the
+summary too if that isn't enough. Between those points the view only grows at the end,
+so its prefix stays byte-stable for provider-side prompt caching.
+
+Token counts are cached per message, so each step only counts the new messages.
+Based on the trim and summarize patterns in `labs_full/13_memory_and_reducers.ipynb`.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import MessagesState
+
+DEFAULT_TOKEN_BUDGET = 16_000
+DEFAULT_TOOL_OUTPUT_MAX_CHARS = 2_000
+
+TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+TOOL_OUTPUT_MAX_CHARS = int(
+    os.getenv("TOOL_OUTPUT_MAX_CHARS", DEFAULT_TOOL_OUTPUT_MAX_CHARS)
+)
+
+
+class State(MessagesState):
+    """Messages plus a summary of the ones the LLM no longer sees."""
+
+    summary: str
+    # Id of the last message folded into the summary
+    summarized_until: str
+    # Id of the last message whose tool output the LLM sees truncated
+    truncated_until: str
+
+
+class TokenCounter:
+    """Count message tokens, caching the count of each message by id."""
+
+    def __init__(self, model: BaseChatModel, max_entries: int = 100_000):
+        self.model = model
+        self.max_entries = max_entries
+        self._counts: OrderedDict[tuple, int] = OrderedDict()
+        self._approximate = False
+
+    def _count(self, message: BaseMessage) -> int:
+        if not self._approximate:
+            try:
+                return self.model.get_num_tokens_from_messages([message])
+            except Exception:
+                # The tokenizer files can't be downloaded, e.g. when running offline
+                self._approximate = True
+        text = str(message.content) + str(getattr(message, "tool_calls", ""))
+        return len(text) // 4 + 4
+
+    def count(self, message: BaseMessage) -> int:
+        """Count the tokens of a single message."""
+        if message.id is None:
+            return self._count(message)
+        # Truncated copies share the id of the original, so the key includes the size
+        key = (message.id, len(str(message.content)), len(message.additional_kwargs))
+        if key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+        count = self._count(message)
+        self._counts[key] = count
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return count
+
+    def total(self, messages: list[BaseMessage]) -> int:
+        """Count the tokens of a list of messages."""
+        return sum(self.count(message) for message in messages)
+
+
+def truncate_tool_output(message: BaseMessage, max_chars: int) -> BaseMessage:
+    """Return a copy of a tool message with its content cut to ``max_chars``."""
+    content = message.content
+    if message.type != "tool" or not isinstance(content, str):
+        return message
+    if len(content) <= max_chars:
+        return message
+    return message.model_copy(
+        update={
+            "content": content[:max_chars]
+            + f"\n... (truncated {len(content) - max_chars} characters)"
+        }
+    )
+
+
+def _position(messages: list[BaseMessage], id: str | None) -> int:
+    """Index of the message with ``id`` in ``messages``, or -1."""
+    if id:
+        for i, message in enumerate(messages):
+            if message.id == id:
+                return i
+    return -1
+
+
+def _truncate_through(
+    messages: list[BaseMessage], end: int, max_chars: int
+) -> list[BaseMessage]:
+    """Truncate the tool outputs of ``messages[: end + 1]``."""
+    return [
+        truncate_tool_output(message, max_chars) if i <= end else message
+        for i, message in enumerate(messages)
+    ]
+
+
+def _unsummarized(state: State) -> list[BaseMessage]:
+    """Messages after the ones folded into the summary."""
+    messages = state["messages"]
+    return messages[_position(messages, state.get("summarized_until")) + 1 :]
+
+
+def context_messages(
+    state: State, tool_output_max_chars: int = TOOL_OUTPUT_MAX_CHARS
+) -> list[BaseMessage]:
+    """Return the messages the LLM sees.
+
+    Those are the messages after the summarized ones, with tool outputs truncated up
+    to the truncation point set by the `budget` node.
+    """
+    messages = _unsummarized(state)
+    end = _position(messages, state.get("truncated_until"))
+    return _truncate_through(messages, end, tool_output_max_chars)
+
+
+def summary_message(summary: str) -> SystemMessage:
+    """Build the system message that carries the summary of earlier turns."""
+    return SystemMessage(content=f"Summary of conversation earlier: {summary}")
+
+
+async def summarize(
+    model: BaseChatModel, messages: list[BaseMessage], summary: str
+) -> str:
+    """Fold ``messages`` into the running summary."""
+    if summary:
+        prompt = (
+            f"This is summary of the conversation to date: {summary}\n\n"
+            "Extend the summary by taking into account the new messages above:"
+        )
+    else:
+        prompt = "Create a summary of the conversation above:"
+
+    # Tagged so the summary isn't streamed to the chat UI in "messages" stream mode
+    response = await model.with_config(tags=[TAG_NOSTREAM]).ainvoke(
+        [*messages, HumanMessage(content=prompt)]
+    )
+    return response.content
+
+
+def make_budget_node(
+    model: BaseChatModel,
+    system_message: SystemMessage,
+    token_budget: int = TOKEN_BUDGET,
+    tool_output_max_chars: int = TOOL_OUTPUT_MAX_CHARS,
+) -> Callable:
+    """Build the node that keeps the LLM's view of the thread under ``token_budget``.
+
+    When the view is over budget, the tool outputs of every turn before the current
+    one are truncated first. If it's still over budget, the oldest turns are also
+    summarized until the rest fits in half the budget. Both only happen when the
+    budget is crossed, so the prompt prefix only changes once in a while. The tool
+    outputs of the current turn are only truncated as a last resort, when the turn
+    doesn't fit in the budget on its own.
+    """
+    counter = TokenCounter(model)
+
+    async def budget(state: State):
+        """Truncate and summarize older turns if the LLM's view is over budget."""
+        summary = state.get("summary", "")
+        prefix = [system_message] + ([summary_message(summary)] if summary else [])
+        messages = context_messages(state, tool_output_max_chars)
+        if counter.total(prefix) + counter.total(messages) <= token_budget:
+            return {}
+
+        # Only cut at the start of a turn, so tool calls stay next to their results
+        unsummarized = _unsummarized(state)
+        boundaries = [
+            i for i, m in enumerate(unsummarized) if m.type == "human" and i > 0
+        ]
+        update = {}
+        if boundaries:
+            update["truncated_until"] = unsummarized[boundaries[-1] - 1].id
+            messages = _truncate_through(
+                unsummarized, boundaries[-1] - 1, tool_output_max_chars
+            )
+            if counter.total(prefix) + counter.total(messages) <= token_budget:
+                return update
+
+            cut = boundaries[-1]
+            for boundary in boundaries:
+                if counter.total(messages[boundary:]) <= token_budget // 2:
+                    cut = boundary
+                    break
+
+            update["summary"] = await summarize(model, messages[:cut], summary)
+            update["summarized_until"] = messages[cut - 1].id
+            prefix = [system_message, summary_message(update["summary"])]
+            messages = messages[cut:]
+            if counter.total(prefix) + counter.total(messages) <= token_budget:
+                return update
+
+        # The current turn doesn't fit on its own, e.g. after a huge tool output, so
+        # its tool outputs are truncated too
+        update["truncated_until"] = messages[-1].id
+        return update
+
+    return budget
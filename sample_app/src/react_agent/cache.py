@@ -0,0 +1,86 @@
+"""Per-user cache for the conversation sidebar.
+
+The sidebar lists the user's threads and is rendered on every page load. Caching the
+`threads.search` result and the rendered sidebar for a short TTL avoids hitting the
+LangGraph API each time, and the set of thread ids the user is known to own lets the
+conversation route skip the `threads.create` round-trip for existing threads.
+"""
+
+import os
+import time
+from typing import Any
+
+DEFAULT_SIDEBAR_TTL_SECONDS = 30.0
+
+
+class SidebarCache:
+    """Cache threads and rendered sidebars per user with TTL expiry."""
+
+    def __init__(self, ttl: float = DEFAULT_SIDEBAR_TTL_SECONDS):
+        self.ttl = ttl
+        self._threads: dict[str, tuple[float, list[dict]]] = {}
+        self._rendered: dict[tuple[str, str], tuple[float, Any]] = {}
+        self._known: dict[str, dict[str, float]] = {}
+
+    def get_threads(self, user_id: str) -> list[dict] | None:
+        """Return the cached thread list for a user, or None if missing or expired."""
+        entry = self._threads.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set_threads(self, user_id: str, threads: list[dict]) -> None:
+        """Cache the thread list for a user and remember its thread ids."""
+        self.evict_expired()
+        self._threads[user_id] = (time.monotonic() + self.ttl, threads)
+        for thread in threads:
+            self.add_known_thread(user_id, thread["thread_id"])
+
+    def get_rendered(self, user_id: str, current_thread_id: str) -> Any | None:
+        """Return the cached sidebar rendered for the given current thread."""
+        entry = self._rendered.get((user_id, current_thread_id))
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set_rendered(self, user_id: str, current_thread_id: str, sidebar: Any) -> None:
+        """Cache a rendered sidebar until the user's thread list expires."""
+        entry = self._threads.get(user_id)
+        expires_at = entry[0] if entry else time.monotonic() + self.ttl
+        self._rendered[(user_id, current_thread_id)] = (expires_at, sidebar)
+
+    def is_known_thread(self, user_id: str, thread_id: str) -> bool:
+        """Whether the thread is known to exist for the user."""
+        expires_at = self._known.get(user_id, {}).get(thread_id)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def add_known_thread(self, user_id: str, thread_id: str) -> None:
+        """Remember that a thread exists for the user."""
+        self._known.setdefault(user_id, {})[thread_id] = time.monotonic() + self.ttl
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop the cached thread list and rendered sidebars of a user."""
+        self._threads.pop(user_id, None)
+        for key in [key for key in self._rendered if key[0] == user_id]:
+            del self._rendered[key]
+        self.evict_expired()
+
+    def evict_expired(self) -> None:
+        """Drop every expired entry."""
+        now = time.monotonic()
+        for user_id in [u for u, (exp, _) in self._threads.items() if exp <= now]:
+            del self._threads[user_id]
+        for key in [k for k, (exp, _) in self._rendered.items() if exp <= now]:
+            del self._rendered[key]
+        for user_id, known in list(self._known.items()):
+            for thread_id in [t for t, exp in known.items() if exp <= now]:
+                del known[thread_id]
+            if not known:
+                del self._known[user_id]
+
+
+def get_sidebar_cache() -> SidebarCache:
+    """Build the sidebar cache, using `SIDEBAR_CACHE_TTL` (seconds) if set."""
+    return SidebarCache(
+        ttl=float(os.getenv("SIDEBAR_CACHE_TTL", DEFAULT_SIDEBAR_TTL_SECONDS))
+    )
@@ -1,82 +1,156 @@
 """A simple chatbot."""
 
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Literal
 
 from dotenv import load_dotenv
-from langchain_core.messages import SystemMessage, ToolMessage
-from langchain_core.tools import tool
+from langchain_core.messages import SystemMessage, ToolCall, ToolMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, MessagesState, StateGraph
 
+from react_agent.budget import (
+    State,
+    context_messages,
+    make_budget_node,
+    summary_message,
+)
+from react_agent.sandbox import get_sandbox_pool
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 model = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
 
 
 # THIS IS DANGEROUS, DO NOT USE IN PRODUCTION
-@tool
-def run_python_code(code: str) -> str:
+def _run_python_code(code: str) -> str:
     """Run arbitrary Python code including imports, assignments, and statements. Do not use any external libraries. Save your results as a variable.
 
     Args:
         code: Python code to run
     """
-    import sys
-    from io import StringIO
-
-    old_stdout = sys.stdout
-    sys.stdout = captured_output = StringIO()
+    return get_sandbox_pool().run_sync(code)
 
-    namespace = {}
 
-    try:
-        exec(code, namespace)
-
-        output = captured_output.getvalue()
+async def _arun_python_code(code: str) -> str:
+    """Run the code in the sandbox pool without blocking the event loop."""
+    return await get_sandbox_pool().run(code)
 
-        if not output.strip():
-            user_vars = {
-                k: v
-                for k, v in namespace.items()
-                if not k.startswith("__") and k not in ["StringIO", "sys"]
-            }
-            if user_vars:
-                if len(user_vars) == 1:
-                    output = str(list(user_vars.values())[0])
-                else:
-                    output = str(user_vars)
 
-        return output.strip() if output.strip() else "Code executed successfully"
-
-    except Exception as e:
-        return f"Error: {str(e)}"
-    finally:
-        sys.stdout = old_stdout
+run_python_code = StructuredTool.from_function(
+    func=_run_python_code,
+    coroutine=_arun_python_code,
+    name="run_python_code",
+)
 
 
 # THIS IS DANGEROUS, DO NOT USE IN PRODUCTION
 
 tools = [run_python_code]
 tools_by_name = {tool.name: tool for tool in tools}
+# Bounded pool for sync tools, so they run in parallel without blocking the loop
+tool_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")), thread_name_prefix="tool"
+)
 model_with_tools = model.bind_tools(tools)
 
 
-def llm_call(state: MessagesState):
-    """Call the LLM with the current messages."""
-    messages = [
-        SystemMessage(content="You are a helpful assistant that can run python code."),
-    ] + state["messages"]
-    return {"messages": [model_with_tools.invoke(messages)]}
+# Built once so every request starts with the same bytes: system prompt, then tools,
+# then the append-only history. That stable prefix is what provider-side prompt
+# caching matches on.
+SYSTEM_MESSAGE = SystemMessage(
+    content="You are a helpful assistant that can run python code."
+)
+
+
+@dataclass
+class PromptCacheStats:
+    """Provider-side prompt cache hits and misses, from the response usage metadata."""
+
+    hits: int = 0
+    misses: int = 0
+    cached_tokens: int = 0
+    input_tokens: int = 0
+
+    def record(self, usage: UsageMetadata | None) -> None:
+        """Count a response as a hit if part of its prompt was read from the cache."""
+        if not usage:
+            return
+        cached = usage.get("input_token_details", {}).get("cache_read", 0) or 0
+        self.hits += cached > 0
+        self.misses += cached == 0
+        self.cached_tokens += cached
+        self.input_tokens += usage.get("input_tokens", 0)
+        logger.info(
+            "prompt cache %s: %d/%d input tokens cached (hits=%d, misses=%d)",
+            "hit" if cached else "miss",
+            cached,
+            usage.get("input_tokens", 0),
+            self.hits,
+            self.misses,
+        )
 
 
-def tool_node(state: dict):
-    """Call the tools with the current messages."""
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
-    return {"messages": result}
+prompt_cache_stats = PromptCacheStats()
+
+
+async def llm_call(state: State):
+    """Call the LLM with the current messages.
+
+    Turns folded into the summary by the budget node are replaced by the summary.
+    """
+    messages = [SYSTEM_MESSAGE]
+    if state.get("summary"):
+        messages.append(summary_message(state["summary"]))
+    messages.extend(context_messages(state))
+    response = await model_with_tools.ainvoke(messages)
+    prompt_cache_stats.record(response.usage_metadata)
+    return {"messages": [response]}
+
+
+async def call_tool(tool_call: ToolCall) -> ToolMessage:
+    """Call a single tool, turning any failure into an error ToolMessage.
+
+    Async tools run on the event loop and sync tools on a bounded thread pool.
+    """
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return ToolMessage(
+            content=f"Error: unknown tool {tool_call['name']}",
+            tool_call_id=tool_call["id"],
+            status="error",
+        )
+    try:
+        if getattr(tool, "coroutine", None) is not None:
+            observation = await tool.ainvoke(tool_call["args"])
+        else:
+            loop = asyncio.get_running_loop()
+            observation = await loop.run_in_executor(
+                tool_executor, tool.invoke, tool_call["args"]
+            )
+        return ToolMessage(content=observation, tool_call_id=tool_call["id"])
+    except Exception as e:
+        return ToolMessage(
+            content=f"Error: {str(e)}", tool_call_id=tool_call["id"], status="error"
+        )
+
+
+async def tool_node(state: dict):
+    """Call the tools with the current messages concurrently.
+
+    ToolMessages are returned in the same order as the tool calls.
+    """
+    result = await asyncio.gather(
+        *[call_tool(tool_call) for tool_call in state["messages"][-1].tool_calls]
+    )
+    return {"messages": list(result)}
 
 
 def should_continue(state: MessagesState) -> Literal["environment", END]:
@@ -88,12 +162,14 @@ def should_continue(state: MessagesState) -> Literal["environment", END]:
     return END
 
 
-graph = StateGraph(MessagesState)
+graph = StateGraph(State)
 
+graph.add_node("budget", make_budget_node(model, SYSTEM_MESSAGE))
 graph.add_node("llm_call", llm_call)
 graph.add_node("environment", tool_node)
 
-graph.add_edge(START, "llm_call")
+graph.add_edge(START, "budget")
+graph.add_edge("budget", "llm_call")
 graph.add_conditional_edges(
     "llm_call",
     should_continue,
@@ -102,4 +178,4 @@ graph.add_conditional_edges(
         END: END,
     },
 )
-graph.add_edge("environment", "llm_call")
+graph.add_edge("environment", "budget")
@@ -0,0 +1,204 @@
+"""Registry of in-flight agent runs.
+
+`send_message` registers the run it starts under the typing indicator id, and the
+response routes claim it once the browser asks for the AI response. Entries expire
+after a TTL and the registry is bounded in size, so runs that are never polled don't
+leak memory.
+
+Two backends are available:
+
+- `InMemoryRunRegistry`: per-process, good for a single worker.
+- `SQLiteRunRegistry`: backed by a SQLite file, shared by every worker and process
+  on the same host.
+
+Use `get_run_registry` to pick one from the environment.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any
+
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_MAX_SIZE = 10_000
+
+
+class RunRegistry(ABC):
+    """Store run details keyed by typing indicator id."""
+
+    def __init__(
+        self, ttl: float = DEFAULT_TTL_SECONDS, max_size: int = DEFAULT_MAX_SIZE
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @abstractmethod
+    async def put(self, key: str, value: dict[str, Any]) -> None:
+        """Register a run, evicting expired and oldest entries if needed."""
+
+    @abstractmethod
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return a run without removing it, or None if missing or expired."""
+
+    @abstractmethod
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        """Claim a run, removing it from the registry."""
+
+    @abstractmethod
+    async def size(self) -> int:
+        """Return the number of live entries."""
+
+
+class InMemoryRunRegistry(RunRegistry):
+    """Per-process registry backed by an ordered dict."""
+
+    def __init__(
+        self, ttl: float = DEFAULT_TTL_SECONDS, max_size: int = DEFAULT_MAX_SIZE
+    ):
+        super().__init__(ttl, max_size)
+        # Insertion order is also expiry order since every entry has the same TTL
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_size:
+                break
+            del self._entries[key]
+
+    async def put(self, key: str, value: dict[str, Any]) -> None:
+        """Register a run, evicting expired and oldest entries if needed."""
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._evict()
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return a run without removing it, or None if missing or expired."""
+        self._evict()
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        """Claim a run, removing it from the registry."""
+        self._evict()
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    async def size(self) -> int:
+        """Return the number of live entries."""
+        self._evict()
+        return len(self._entries)
+
+
+class SQLiteRunRegistry(RunRegistry):
+    """Registry shared across workers and processes through a SQLite file.
+
+    Claims use `DELETE ... RETURNING`, so only one worker can get a given run.
+    Blocking SQLite calls run in a thread to keep the event loop free.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        super().__init__(ttl, max_size)
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS runs_expires_at ON runs (expires_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def _put(self, key: str, value: dict[str, Any]) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM runs WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now + self.ttl),
+            )
+            conn.execute(
+                """
+                DELETE FROM runs WHERE key IN (
+                    SELECT key FROM runs ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_size,),
+            )
+            conn.execute("COMMIT")
+
+    def _get(self, key: str) -> dict[str, Any] | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM runs WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _pop(self, key: str) -> dict[str, Any] | None:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "DELETE FROM runs WHERE key = ? RETURNING value, expires_at", (key,)
+            ).fetchone()
+        if not row or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def _size(self) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM runs WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+        return row[0]
+
+    async def put(self, key: str, value: dict[str, Any]) -> None:
+        """Register a run, evicting expired and oldest entries if needed."""
+        await asyncio.to_thread(self._put, key, value)
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return a run without removing it, or None if missing or expired."""
+        return await asyncio.to_thread(self._get, key)
+
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        """Claim a run, removing it from the registry."""
+        return await asyncio.to_thread(self._pop, key)
+
+    async def size(self) -> int:
+        """Return the number of live entries."""
+        return await asyncio.to_thread(self._size)
+
+
+def get_run_registry() -> RunRegistry:
+    """Build the run registry configured in the environment.
+
+    Set `RUN_REGISTRY_PATH` to a SQLite file to share runs across workers.
+    `RUN_REGISTRY_TTL` (seconds) and `RUN_REGISTRY_MAX_SIZE` tune eviction.
+    """
+    ttl = float(os.getenv("RUN_REGISTRY_TTL", DEFAULT_TTL_SECONDS))
+    max_size = int(os.getenv("RUN_REGISTRY_MAX_SIZE", DEFAULT_MAX_SIZE))
+    path = os.getenv("RUN_REGISTRY_PATH")
+    if path:
+        return SQLiteRunRegistry(path, ttl=ttl, max_size=max_size)
+    return InMemoryRunRegistry(ttl=ttl, max_size=max_size)
@@ -0,0 +1,291 @@
+"""Pooled subprocess executor for the `run_python_code` tool.
+
+Code runs in a pool of pre-warmed worker subprocesses instead of the server process.
+Each worker runs one snippet at a time with its own captured stdout, and every call is
+bounded by CPU time, wall time and memory limits. A worker that hits a limit or crashes
+is killed and replaced.
+
+Workers only use the standard library, so this module is also run directly as the
+worker script. They start in isolated mode with an empty environment, so API keys are
+not visible to snippets. This is NOT a security boundary: it isolates output and
+resource usage, not file system or network access.
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_CPU_SECONDS = 5
+DEFAULT_WALL_SECONDS = 10.0
+DEFAULT_MEMORY_MB = 512
+DEFAULT_MAX_CALLS_PER_WORKER = 100
+
+
+def execute(code: str) -> str:
+    """Run ``code`` and return its output, or its variables if it printed nothing."""
+    from io import StringIO
+
+    old_stdout = sys.stdout
+    sys.stdout = captured_output = StringIO()
+
+    namespace: dict[str, Any] = {}
+
+    try:
+        exec(code, namespace)
+
+        output = captured_output.getvalue()
+
+        if not output.strip():
+            user_vars = {
+                k: v
+                for k, v in namespace.items()
+                if not k.startswith("__") and k not in ["StringIO", "sys"]
+            }
+            if user_vars:
+                if len(user_vars) == 1:
+                    output = str(list(user_vars.values())[0])
+                else:
+                    output = str(user_vars)
+
+        return output.strip() if output.strip() else "Code executed successfully"
+
+    except MemoryError:
+        return "Error: memory limit exceeded"
+    except Exception as e:
+        return f"Error: {str(e)}"
+    finally:
+        sys.stdout = old_stdout
+
+
+def _worker_main(cpu_seconds: int, memory_mb: int) -> None:
+    """Serve execution requests, one JSON line per request and per response."""
+    # Keep the pipes for the protocol and point fds 0 and 1 to /dev/null, so
+    # snippets can't read requests or corrupt responses
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdin = open(os.devnull, encoding="utf-8")
+
+    if resource is not None:
+        memory = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+    for line in requests:
+        if resource is not None:
+            # RLIMIT_CPU counts the whole process lifetime, so move the soft limit
+            # forward to give each call its own budget
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, hard))
+
+        output = execute(json.loads(line)["code"])
+        responses.write(json.dumps({"output": output}) + "\n")
+        responses.flush()
+
+
+class SandboxLimitError(Exception):
+    """Raised when a snippet exceeds a limit or kills its worker."""
+
+
+class _Worker:
+    """A worker subprocess and its protocol pipes.
+
+    `select` only accepts sockets on Windows, so a thread reads the worker's responses
+    into a queue instead, and `call` waits on that queue with a timeout.
+    """
+
+    def __init__(self, cpu_seconds: int, memory_mb: int):
+        self.calls = 0
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={
+                "SANDBOX_WORKER_CPU_SECONDS": str(cpu_seconds),
+                "SANDBOX_WORKER_MEMORY_MB": str(memory_mb),
+            },
+        )
+        self._responses: queue.Queue[bytes | None] = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        assert self.process.stdout is not None
+        with self.process.stdout as stdout:
+            try:
+                for line in stdout:
+                    self._responses.put(line)
+            except (OSError, ValueError):
+                pass
+        # The worker exited
+        self._responses.put(None)
+
+    def call(self, code: str, timeout: float) -> str:
+        """Send ``code`` to the worker and wait up to ``timeout`` seconds."""
+        assert self.process.stdin is not None
+        self.calls += 1
+        try:
+            self.process.stdin.write((json.dumps({"code": code}) + "\n").encode())
+            self.process.stdin.flush()
+        except BrokenPipeError as e:
+            raise SandboxLimitError("worker exited") from e
+
+        try:
+            line = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            raise SandboxLimitError(
+                f"wall time limit of {timeout:g}s exceeded"
+            ) from None
+        if line is None:
+            self.process.wait()
+            raise SandboxLimitError(self._exit_reason())
+        return json.loads(line)["output"]
+
+    def _exit_reason(self) -> str:
+        if self.process.returncode == -getattr(signal, "SIGXCPU", 0):
+            return "CPU time limit exceeded"
+        return f"worker exited with code {self.process.returncode}"
+
+    def alive(self) -> bool:
+        """Whether the worker process is still running."""
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        """Kill the worker process."""
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        # The reader thread closes stdout once it sees the end of the pipe
+        if self.process.stdin is not None:
+            self.process.stdin.close()
+
+
+class SandboxPool:
+    """Pool of pre-warmed worker subprocesses that run Python snippets.
+
+    ``run_sync`` blocks the calling thread until a worker is free and has answered.
+    ``run`` does the same on the pool's own threads, one per worker, so the event loop
+    keeps serving other requests. Calls waiting for a worker wait in that executor's
+    queue rather than blocking a thread of the loop's default executor, which the
+    rest of the app uses through `asyncio.to_thread`.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        cpu_seconds: int = DEFAULT_CPU_SECONDS,
+        wall_seconds: float = DEFAULT_WALL_SECONDS,
+        memory_mb: int = DEFAULT_MEMORY_MB,
+        max_calls_per_worker: int = DEFAULT_MAX_CALLS_PER_WORKER,
+    ):
+        self.size = size
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.max_calls_per_worker = max_calls_per_worker
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="sandbox"
+        )
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.cpu_seconds, self.memory_mb)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+
+    def start(self) -> None:
+        """Spawn every worker so they are warm before the first call."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def run_sync(self, code: str) -> str:
+        """Run ``code`` in a free worker and return its output."""
+        self.start()
+        worker = self._idle.get()
+        try:
+            return worker.call(code, self.wall_seconds)
+        except SandboxLimitError as e:
+            self._retire(worker)
+            worker = self._spawn()
+            return f"Error: {e}"
+        finally:
+            if worker.calls >= self.max_calls_per_worker or not worker.alive():
+                self._retire(worker)
+                worker = self._spawn()
+            self._idle.put(worker)
+
+    async def run(self, code: str) -> str:
+        """Run ``code`` in a free worker without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.run_sync, code)
+
+    def close(self) -> None:
+        """Kill every worker."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
+
+
+_pool: SandboxPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool, configured from the environment.
+
+    `SANDBOX_POOL_SIZE`, `SANDBOX_CPU_SECONDS`, `SANDBOX_WALL_SECONDS` and
+    `SANDBOX_MEMORY_MB` override the defaults.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                size=int(os.getenv("SANDBOX_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                cpu_seconds=int(os.getenv("SANDBOX_CPU_SECONDS", DEFAULT_CPU_SECONDS)),
+                wall_seconds=float(
+                    os.getenv("SANDBOX_WALL_SECONDS", DEFAULT_WALL_SECONDS)
+                ),
+                memory_mb=int(os.getenv("SANDBOX_MEMORY_MB", DEFAULT_MEMORY_MB)),
+            )
+            atexit.register(_pool.close)
+        return _pool
+
+
+if __name__ == "__main__":
+    _worker_main(
+        int(os.environ["SANDBOX_WORKER_CPU_SECONDS"]),
+        int(os.environ["SANDBOX_WORKER_MEMORY_MB"]),
+    )
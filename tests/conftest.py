@@ -0,0 +1,51 @@
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import openai
+import pytest
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "sample_app" / "bench"))
+
+from mock_openai import MockConfig, build_app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def mock_openai_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = MockConfig(latency=0.0, tokens_per_second=0, embedding_latency=0.0)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            build_app(config), host="127.0.0.1", port=port, log_level="warning"
+        )
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/v1"
+    # The openai client builds its response models on first use, which can race
+    # when the first requests of a test run in parallel
+    client = openai.OpenAI(base_url=url, api_key="mock")
+    client.chat.completions.create(
+        model="mock", messages=[{"role": "user", "content": "hi"}]
+    ).model_dump()
+
+    yield url
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def mock_openai(mock_openai_url, monkeypatch):
+    """Point the OpenAI clients created by the test at the bench's mock server."""
+    monkeypatch.setenv("OPENAI_BASE_URL", mock_openai_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    monkeypatch.setenv("LANGSMITH_TRACING", "false")
+    return mock_openai_url
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs"))
+
+from batch import run_batch, run_batch_async  # noqa: E402
+
+
+def write_inputs(path: Path, texts: list[str]) -> Path:
+    path.write_text("".join(json.dumps({"input": text}) + "\n" for text in texts))
+    return path
+
+
+def read_results(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line]
+
+
+def test_resume_skips_completed_inputs_and_retries_failures(tmp_path):
+    inputs = write_inputs(tmp_path / "inputs.jsonl", ["a", "b", "c", "d"])
+    output = tmp_path / "results.jsonl"
+    calls = []
+    flaky = {"c"}
+
+    async def workflow(text: str) -> str:
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        if text in flaky:
+            raise ValueError(f"failed on {text}")
+        return text.upper()
+
+    asyncio.run(run_batch_async(workflow, inputs, output, max_in_flight=2))
+    errors = [r for r in read_results(output) if "error" in r]
+    assert [r["input"] for r in errors] == ["c"]
+
+    # Crash while writing the result of "d", leaving a partial line behind
+    lines = output.read_text().splitlines()
+    partial = next(line for line in lines if '"input": "d"' in line)[:20]
+    kept = [line for line in lines if '"input": "d"' not in line]
+    output.write_text("\n".join(kept + [partial]))
+
+    calls.clear()
+    flaky.clear()
+    asyncio.run(run_batch_async(workflow, inputs, output, max_in_flight=2))
+
+    assert sorted(calls) == ["c", "d"]
+    lines = output.read_text().splitlines()
+    assert partial in lines
+    results = {
+        r["id"]: r["result"]
+        for r in (json.loads(line) for line in lines if line.endswith("}"))
+        if "error" not in r
+    }
+    assert results == {"0": "A", "1": "B", "2": "C", "3": "D"}
+
+
+def test_in_flight_workflows_are_bounded(tmp_path):
+    inputs = write_inputs(tmp_path / "inputs.jsonl", [str(i) for i in range(20)])
+    running = peak = 0
+
+    async def workflow(text: str) -> str:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return text
+
+    asyncio.run(
+        run_batch_async(workflow, inputs, tmp_path / "out.jsonl", max_in_flight=3)
+    )
+    assert peak == 3
+    assert len(read_results(tmp_path / "out.jsonl")) == 20
+
+
+def test_executor_batch_resumes_from_csv_ids(tmp_path):
+    inputs = tmp_path / "inputs.csv"
+    inputs.write_text("id,input\nx,one\ny,two\nz,three\n")
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": "y", "input": "two", "result": 3}) + "\n")
+
+    with ThreadPoolExecutor(2) as executor:
+        run_batch(len, executor, inputs, output)
+
+    results = {r["id"]: r["result"] for r in read_results(output)}
+    assert results == {"x": 3, "y": 3, "z": 5}
+    assert len(read_results(output)) == 3
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "sample_app" / "src"))
+# Importing the package builds the agent's model, which needs a key
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from react_agent.budget import (  # noqa: E402
+    TokenCounter,
+    context_messages,
+    make_budget_node,
+    summary_message,
+)
+
+SYSTEM = SystemMessage(content="You are a helpful assistant.")
+MAX_CHARS = 200
+
+
+def turn(i: int) -> list:
+    output = " ".join(f"row {j}: value {j * 7}" for j in range(300))
+    return [
+        HumanMessage(content=f"Question {i}", id=f"human-{i}"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "run_python_code", "args": {}, "id": f"call-{i}"}],
+            id=f"call-{i}",
+        ),
+        ToolMessage(content=output, tool_call_id=f"call-{i}", id=f"tool-{i}"),
+        AIMessage(content=f"Answer {i}", id=f"answer-{i}"),
+    ]
+
+
+def thread(turns: int) -> dict:
+    messages = [message for i in range(turns) for message in turn(i)]
+    # The current turn has just started
+    return {"messages": messages + [HumanMessage(content="Next", id="current")]}
+
+
+@pytest.fixture
+def model(mock_openai):
+    return ChatOpenAI(model="gpt-4.1-mini", temperature=0)
+
+
+def view_tokens(counter: TokenCounter, state: dict) -> int:
+    prefix = [SYSTEM]
+    if state.get("summary"):
+        prefix.append(summary_message(state["summary"]))
+    return counter.total(prefix + context_messages(state, MAX_CHARS))
+
+
+def run_node(model, state: dict, token_budget: int) -> dict:
+    node = make_budget_node(model, SYSTEM, token_budget, MAX_CHARS)
+    update = asyncio.run(node(state))
+    state.update(update)
+    return update
+
+
+def test_under_budget_leaves_the_thread_alone(model):
+    state = thread(2)
+    budget = view_tokens(TokenCounter(model), state) + 100
+    assert run_node(model, state, budget) == {}
+
+
+def test_older_tool_outputs_are_truncated_first(model):
+    counter = TokenCounter(model)
+    state = thread(3)
+    full = view_tokens(counter, state)
+    truncated = view_tokens(counter, {**state, "truncated_until": "answer-2"})
+
+    update = run_node(model, state, (full + truncated) // 2)
+
+    assert update == {"truncated_until": "answer-2"}
+    messages = context_messages(state, MAX_CHARS)
+    assert all(len(m.content) < 300 for m in messages if m.type == "tool")
+    assert view_tokens(counter, state) <= (full + truncated) // 2
+
+    # The view only grows at the end until the budget is crossed again
+    before = context_messages(state, MAX_CHARS)
+    state["messages"].append(AIMessage(content="Thinking", id="current-answer"))
+    assert run_node(model, state, (full + truncated) // 2) == {}
+    assert context_messages(state, MAX_CHARS)[: len(before)] == before
+
+
+def test_older_turns_are_summarized_when_truncating_isnt_enough(model):
+    counter = TokenCounter(model)
+    state = thread(6)
+    truncated = view_tokens(counter, {**state, "truncated_until": "answer-5"})
+    budget = truncated // 2
+
+    update = run_node(model, state, budget)
+
+    # The summary comes from the model, the mock server answers with "mock" words
+    assert update["summary"].startswith("mock")
+    assert update["summarized_until"].startswith("answer-")
+    messages = context_messages(state, MAX_CHARS)
+    assert messages[0].type == "human"
+    assert messages[-1].id == "current"
+    assert view_tokens(counter, state) <= budget
+
+
+def current_turn(rows: int) -> list:
+    output = " ".join(f"row {j}: value {j * 7}" for j in range(rows))
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "run_python_code", "args": {}, "id": "call-current"}],
+            id="call-current",
+        ),
+        ToolMessage(content=output, tool_call_id="call-current", id="tool-current"),
+    ]
+
+
+def test_current_turn_over_budget_on_its_own_is_truncated(model):
+    counter = TokenCounter(model)
+    state = thread(0)
+    state["messages"] += current_turn(2_000)
+    full = view_tokens(counter, state)
+    truncated = view_tokens(counter, {**state, "truncated_until": "tool-current"})
+
+    update = run_node(model, state, (full + truncated) // 2)
+
+    assert update == {"truncated_until": "tool-current"}
+    assert view_tokens(counter, state) <= (full + truncated) // 2
+
+
+def test_current_turn_is_truncated_when_summarizing_isnt_enough(model):
+    counter = TokenCounter(model)
+    state = thread(3)
+    state["messages"] += current_turn(2_000)
+    truncated = view_tokens(
+        counter, {"messages": state["messages"][-3:], "truncated_until": "tool-current"}
+    )
+    # Leaves room for the summary, but not for the current turn's tool output
+    budget = truncated + 200
+
+    update = run_node(model, state, budget)
+
+    assert update["summarized_until"] == "answer-2"
+    assert update["truncated_until"] == "tool-current"
+    messages = context_messages(state, MAX_CHARS)
+    assert [m.id for m in messages] == ["current", "call-current", "tool-current"]
+    assert view_tokens(counter, state) <= budget
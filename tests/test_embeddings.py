@@ -0,0 +1,85 @@
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs_full"))
+
+from embeddings import CachedOpenAIEmbeddingFunction, EmbeddingCache  # noqa: E402
+
+
+@pytest.fixture
+def make_function(mock_openai, tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault("api_base", mock_openai)
+        return CachedOpenAIEmbeddingFunction(
+            api_key="mock", cache_dir=tmp_path, dimensions=8, **kwargs
+        )
+
+    return make
+
+
+def test_cached_texts_dont_call_the_api(make_function):
+    texts = ["daily limits", "card fees", "daily limits"]
+    first = make_function()
+    vectors = first(texts)
+    assert first.stats.requests == 1
+    # Duplicates in the input are only sent once
+    assert first.stats.cache_hits == 1
+
+    # A new function, e.g. after restarting the kernel, reads the cache from disk
+    second = make_function()
+    cached = second(texts + ["new text"])
+
+    assert second.stats.requests == 1
+    assert second.stats.cache_hits == 3
+    for vector, cached_vector in zip(vectors, cached):
+        np.testing.assert_array_equal(vector, cached_vector)
+
+
+def test_texts_are_sent_in_bounded_batches(make_function):
+    function = make_function(max_batch_size=2, max_batch_tokens=10_000)
+    vectors = function([f"text {i}" for i in range(5)])
+    assert len(vectors) == 5
+    assert function.stats.requests == 3
+
+    function = make_function(max_batch_tokens=1)
+    function([f"other text {i}" for i in range(4)])
+    assert function.stats.requests == 4
+
+
+def test_batches_are_rate_limited(make_function):
+    # 20 requests per second, with a burst of 20
+    function = make_function(max_batch_size=1, requests_per_minute=1200)
+    start = time.monotonic()
+    function([f"text {i}" for i in range(26)])
+    assert function.stats.requests == 26
+    assert time.monotonic() - start >= 0.25
+
+
+def test_cache_is_namespaced_by_base_url(make_function, mock_openai):
+    make_function()(["daily limits"])
+    # The same server under another URL, e.g. a proxy in front of the API
+    other = make_function(api_base=mock_openai.replace("127.0.0.1", "localhost"))
+    other(["daily limits"])
+    assert other.stats.requests == 1
+    assert other.stats.cache_hits == 0
+
+
+def test_vectors_written_before_a_crash_are_dropped(tmp_path):
+    a, b, c = [hashlib.sha256(text.encode()).hexdigest() for text in "abc"]
+    cache = EmbeddingCache(tmp_path, "model")
+    cache.put([a, b], [np.ones(4), np.full(4, 2.0)])
+    # The process died after appending a vector but before writing its key
+    with (tmp_path / "model.f32").open("ab") as f:
+        f.write(np.full(4, 9.0, dtype=np.float32).tobytes())
+
+    reopened = EmbeddingCache(tmp_path, "model")
+    assert len(reopened) == 2
+    reopened.put([c], [np.full(4, 3.0)])
+
+    vectors = EmbeddingCache(tmp_path, "model").get([a, b, c])
+    assert [vectors[key][0] for key in (a, b, c)] == [1.0, 2.0, 3.0]
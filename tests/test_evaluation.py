@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs_full"))
+
+import evaluation  # noqa: E402
+
+
+def target(inputs: dict) -> dict:
+    return {"answer": inputs["question"].upper()}
+
+
+def correct(inputs: dict, outputs: dict, reference_outputs: dict) -> bool:
+    return outputs["answer"] == reference_outputs["answer"]
+
+
+def failing(inputs: dict, outputs: dict, reference_outputs: dict) -> bool:
+    if inputs["question"] == "b":
+        raise ValueError("evaluator failed")
+    return True
+
+
+@pytest.fixture
+def evals_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(evaluation, "EVALS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_failing_evaluator_round_trips_through_parquet(evals_dir):
+    examples = [
+        {"inputs": {"question": q}, "outputs": {"answer": q.upper()}}
+        for q in ["a", "b", "c"]
+    ]
+
+    results = evaluation.evaluate(target, examples, [correct, failing], "test")
+
+    stored = pd.read_parquet(evals_dir / "test.parquet")
+    assert len(stored) == 3
+    assert stored["correct"].tolist() == [True, True, True]
+    by_question = dict(zip(stored["inputs.question"], stored["failing"]))
+    assert by_question["a"]
+    assert pd.isna(by_question["b"])
+    errors = dict(zip(stored["inputs.question"], stored["failing_error"]))
+    assert "evaluator failed" in errors["b"]
+    assert errors["a"] is None
+    assert stored["correct_error"].isna().all()
+    assert len(results) == 3
@@ -0,0 +1,101 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs"))
+
+from fanout import FanOutExecutor, QuorumError  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+
+
+def vote(value, delay: float, cancelled: list | None = None):
+    async def task():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(value)
+            raise
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return task
+
+
+def test_quorum_returns_early_and_cancels_the_rest():
+    executor = FanOutExecutor()
+    cancelled = []
+    tasks = [vote(True, 0.01), vote(True, 0.02), vote(False, 5, cancelled)]
+
+    start = time.monotonic()
+    results = asyncio.run(executor.map(tasks, quorum=2))
+
+    assert time.monotonic() - start < 1
+    assert results == [True, True]
+    assert cancelled == [False]
+    assert executor.stats.cancelled == 1
+
+
+def test_quorum_tolerates_failures_until_it_cant_be_reached():
+    executor = FanOutExecutor()
+    tasks = [vote(ValueError("boom"), 0.01), vote(True, 0.02), vote(True, 0.03)]
+    assert asyncio.run(executor.map(tasks, quorum=2)) == [True, True]
+
+    tasks = [vote(ValueError("boom"), 0.01), vote(ValueError("boom"), 0.02)]
+    tasks.append(vote(True, 0.03))
+    with pytest.raises(QuorumError) as error:
+        asyncio.run(executor.map(tasks, quorum=2))
+    assert len(error.value.errors) == 2
+
+
+def test_slow_attempts_are_hedged():
+    executor = FanOutExecutor(hedge_after=0.05)
+    calls = 0
+
+    async def straggler():
+        nonlocal calls
+        calls += 1
+        # Only the first attempt is slow
+        await asyncio.sleep(5 if calls == 1 else 0.01)
+        return calls
+
+    start = time.monotonic()
+    result = asyncio.run(executor.run(straggler))
+
+    assert time.monotonic() - start < 1
+    assert result == 2
+    assert executor.stats.hedges == 1
+    assert executor.stats.hedge_wins == 1
+
+
+def test_hedge_delay_follows_the_latency_quantile():
+    executor = FanOutExecutor(hedge_quantile=0.9, min_samples=10)
+    assert asyncio.run(executor.map([vote(i, 0.01) for i in range(10)])) == list(
+        range(10)
+    )
+    assert executor._hedge_delay() < 0.5
+
+    asyncio.run(executor.run(vote("slow", 0.6)))
+    assert executor.stats.hedges == 1
+
+
+def test_timeouts_are_counted_and_raised():
+    executor = FanOutExecutor(timeout=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(executor.run(vote(True, 5)))
+    assert executor.stats.timeouts == 1
+    assert executor.stats.failures == 1
+
+
+def test_rate_limiter_spaces_out_requests():
+    # 20 requests per second, with a burst of 20
+    executor = FanOutExecutor(rate_limiter=RateLimiter(requests_per_minute=1200))
+
+    start = time.monotonic()
+    asyncio.run(executor.map([vote(i, 0) for i in range(30)]))
+
+    assert time.monotonic() - start >= 0.45
@@ -0,0 +1,94 @@
+import sys
+import uuid
+from pathlib import Path
+
+import chromadb
+import pytest
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs_full"))
+
+from indexing import collection_version, index_documents  # noqa: E402
+
+
+class CountingEmbeddingFunction(OpenAIEmbeddingFunction):
+    """Counts the texts sent to the embeddings API."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.embedded = 0
+
+    def __call__(self, input):
+        self.embedded += len(input)
+        return super().__call__(input)
+
+
+@pytest.fixture
+def embedding_function(mock_openai):
+    return CountingEmbeddingFunction(api_key="mock", api_base=mock_openai, dimensions=8)
+
+
+@pytest.fixture
+def collection(embedding_function):
+    client = chromadb.EphemeralClient()
+    return client.create_collection(
+        f"test-{uuid.uuid4().hex}", embedding_function=embedding_function
+    )
+
+
+def chunks(source: str, texts: list[str]) -> list[Document]:
+    return [
+        Document(page_content=text, metadata={"source": source, "page": i})
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_unchanged_documents_arent_embedded_again(
+    collection, embedding_function, tmp_path
+):
+    manifest = tmp_path / "manifest.json"
+    documents = chunks("a.pdf", ["one", "two", "three"]) + chunks("b.pdf", ["four"])
+
+    stats = index_documents(collection, documents, manifest)
+    assert (stats.added, stats.unchanged) == (4, 0)
+    embedded = embedding_function.embedded
+    version = collection_version(collection, manifest)
+
+    stats = index_documents(collection, iter(documents), manifest)
+    assert (stats.added, stats.deleted, stats.unchanged) == (0, 0, 4)
+    assert embedding_function.embedded == embedded
+    assert collection_version(collection, manifest) == version
+
+
+def test_changed_and_removed_chunks_are_synced(
+    collection, embedding_function, tmp_path
+):
+    manifest = tmp_path / "manifest.json"
+    index_documents(
+        collection,
+        chunks("a.pdf", ["one", "two", "three"]) + chunks("b.pdf", ["four"]),
+        manifest,
+    )
+    version = collection_version(collection, manifest)
+    embedded = embedding_function.embedded
+
+    # "two" changed, "three" is gone, and b.pdf isn't part of the run anymore
+    stats = index_documents(collection, chunks("a.pdf", ["one", "2"]), manifest)
+
+    assert (stats.added, stats.deleted, stats.unchanged) == (1, 3, 1)
+    assert stats.sources_deleted == 1
+    assert embedding_function.embedded == embedded + 1
+    assert sorted(collection.get()["documents"]) == ["2", "one"]
+    assert collection_version(collection, manifest) == version + 1
+
+
+def test_chunks_indexed_without_a_manifest_are_cleaned_up(collection, tmp_path):
+    # E.g. indexed by an earlier version of the lab, with ids `str(i)`
+    collection.add(ids=["0", "1"], documents=["one", "two"])
+
+    stats = index_documents(collection, chunks("a.pdf", ["one", "two"]), tmp_path / "m")
+
+    assert (stats.added, stats.deleted) == (2, 2)
+    assert collection.count() == 2
+    assert "0" not in collection.get()["ids"]
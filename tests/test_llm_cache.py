@@ -0,0 +1,36 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.globals import set_llm_cache
+
+LABS = Path(__file__).parents[1] / "labs"
+sys.path.insert(0, str(LABS))
+
+
+@pytest.fixture
+def lab(mock_openai, tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    path = LABS / "9_workflow_parallelization_asyncio.py"
+    spec = importlib.util.spec_from_file_location("parallelization_asyncio", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    set_llm_cache(None)
+
+
+def test_second_identical_run_hits_the_cache(lab):
+    text = "Athletes sometimes take EPO to improve their performance."
+
+    asyncio.run(lab.run_workflow(text))
+    first = lab.llm_cache.stats
+    misses, hits = first.misses, first.hits
+    assert misses > 0
+
+    asyncio.run(lab.run_workflow(text))
+    stats = lab.llm_cache.stats
+    assert stats.misses == misses
+    assert stats.hits > hits
+    assert stats.bypassed == 0
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "sample_app" / "src"))
+# Importing the package builds the agent's model, which needs a key
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from react_agent.registry import InMemoryRunRegistry, SQLiteRunRegistry  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_registry(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return InMemoryRunRegistry(**kwargs)
+        return SQLiteRunRegistry(str(tmp_path / "runs.sqlite"), **kwargs)
+
+    return make
+
+
+def test_a_run_can_only_be_claimed_once(make_registry):
+    registry = make_registry()
+
+    async def scenario():
+        await registry.put("typing-1", {"run_id": "run-1"})
+        assert await registry.get("typing-1") == {"run_id": "run-1"}
+        claims = await asyncio.gather(*[registry.pop("typing-1") for _ in range(5)])
+        return claims, await registry.size()
+
+    claims, size = asyncio.run(scenario())
+    assert [claim for claim in claims if claim] == [{"run_id": "run-1"}]
+    assert size == 0
+
+
+def test_expired_runs_are_dropped(make_registry):
+    registry = make_registry(ttl=0.05)
+
+    async def scenario():
+        await registry.put("typing-1", {"run_id": "run-1"})
+        time.sleep(0.1)
+        return await registry.pop("typing-1"), await registry.size()
+
+    assert asyncio.run(scenario()) == (None, 0)
+
+
+def test_oldest_runs_are_evicted_past_max_size(make_registry):
+    registry = make_registry(max_size=3)
+
+    async def scenario():
+        for i in range(5):
+            await registry.put(f"typing-{i}", {"run_id": f"run-{i}"})
+        return [await registry.get(f"typing-{i}") for i in range(5)]
+
+    runs = asyncio.run(scenario())
+    assert runs[:2] == [None, None]
+    assert [run["run_id"] for run in runs[2:]] == ["run-2", "run-3", "run-4"]
+
+
+def test_sqlite_registry_is_shared_by_workers(tmp_path):
+    path = str(tmp_path / "runs.sqlite")
+    sender, responder = SQLiteRunRegistry(path), SQLiteRunRegistry(path)
+
+    async def scenario():
+        await sender.put("typing-1", {"run_id": "run-1"})
+        return await responder.pop("typing-1"), await sender.pop("typing-1")
+
+    assert asyncio.run(scenario()) == ({"run_id": "run-1"}, None)
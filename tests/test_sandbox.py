@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "sample_app" / "src"))
+# Importing the package builds the agent's model, which needs a key
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from react_agent.sandbox import SandboxPool  # noqa: E402
+
+posix_only = pytest.mark.skipif(
+    sys.platform == "win32", reason="CPU and memory limits use the resource module"
+)
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, cpu_seconds=1, wall_seconds=2.0, memory_mb=256)
+    yield pool
+    pool.close()
+
+
+def test_output_and_variables_are_returned(pool):
+    assert pool.run_sync("print(2 + 2)") == "4"
+    assert pool.run_sync("x = 21 * 2") == "42"
+    assert pool.run_sync("1 / 0") == "Error: division by zero"
+
+
+def test_snippets_dont_see_the_server_environment(pool, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "secret")
+    output = pool.run_sync("import os\nprint(os.environ.get('OPENAI_API_KEY'))")
+    assert output == "None"
+
+
+def test_wall_time_limit_replaces_the_worker(pool):
+    start = time.monotonic()
+    output = pool.run_sync("import time\ntime.sleep(30)")
+    assert output == "Error: wall time limit of 2s exceeded"
+    assert time.monotonic() - start < 5
+    assert pool.run_sync("print('still serving')") == "still serving"
+
+
+@posix_only
+def test_cpu_time_limit(pool):
+    pool.wall_seconds = 10.0
+    output = pool.run_sync("while True:\n    pass")
+    assert output == "Error: CPU time limit exceeded"
+    assert pool.run_sync("print('ok')") == "ok"
+
+
+@posix_only
+def test_memory_limit(pool):
+    output = pool.run_sync("data = bytearray(1024 ** 3)")
+    assert output == "Error: memory limit exceeded"
+    assert pool.run_sync("print('ok')") == "ok"
+
+
+def test_run_doesnt_block_the_event_loop(pool):
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        output = await pool.run("import time\ntime.sleep(0.5)\nprint('done')")
+        ticker.cancel()
+        return output, ticks
+
+    output, ticks = asyncio.run(scenario())
+    assert output == "done"
+    assert ticks > 10
@@ -0,0 +1,106 @@
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs_full"))
+
+from scheduler import PrioritySemaphore, Scheduler  # noqa: E402
+
+
+class Interrupted(Exception):
+    pass
+
+
+def wait_for_waiters(semaphore: PrioritySemaphore, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(semaphore._waiters) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_waiters_get_in_by_priority():
+    semaphore = PrioritySemaphore(1)
+    semaphore.acquire()
+    order = []
+
+    def waiter(priority: int) -> None:
+        semaphore.acquire(priority)
+        order.append(priority)
+        semaphore.release()
+
+    threads = []
+    for priority in [3, 1, 2, 1]:
+        threads.append(threading.Thread(target=waiter, args=(priority,)))
+        threads[-1].start()
+        wait_for_waiters(semaphore, len(threads))
+    semaphore.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [1, 1, 2, 3]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses SIGALRM")
+def test_interrupted_acquire_doesnt_block_later_ones():
+    semaphore = PrioritySemaphore(1)
+    semaphore.acquire()
+
+    def interrupt(signum, frame):
+        raise Interrupted
+
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 0.1)
+        # E.g. a KeyboardInterrupt while the notebook waits for a slot
+        with pytest.raises(Interrupted):
+            semaphore.acquire(priority=0)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+    acquired = threading.Event()
+
+    def waiter() -> None:
+        semaphore.acquire(priority=5)
+        acquired.set()
+
+    # A daemon, so a regression fails the test instead of hanging it
+    thread = threading.Thread(target=waiter, daemon=True)
+    thread.start()
+    semaphore.release()
+    assert acquired.wait(5)
+    thread.join()
+    assert semaphore._waiters == []
+
+
+def test_scheduler_enforces_backend_and_global_limits():
+    scheduler = Scheduler(max_concurrency=3, limits={"llm": 2})
+    lock = threading.Lock()
+    running = {"llm": 0, "all": 0}
+    peak = {"llm": 0, "all": 0}
+
+    def call(backend: str, priority: int) -> None:
+        with scheduler.slot(backend, "interview", priority):
+            with lock:
+                for name in {backend, "all"} & running.keys():
+                    running[name] += 1
+                    peak[name] = max(peak[name], running[name])
+            time.sleep(0.05)
+            with lock:
+                for name in {backend, "all"} & running.keys():
+                    running[name] -= 1
+
+    with ThreadPoolExecutor(8) as executor:
+        for i in range(8):
+            executor.submit(call, "llm" if i % 2 else "search", i)
+
+    assert peak == {"llm": 2, "all": 3}
+    timing = scheduler.timings[("interview", "llm")]
+    assert timing.calls == 4
+    assert timing.run >= 4 * 0.05
+    assert "interview" in scheduler.report()
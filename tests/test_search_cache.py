@@ -0,0 +1,139 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "labs_full"))
+
+from search_cache import ReplayMiss, SearchCache, SeenSources  # noqa: E402
+
+
+class Backend:
+    """Fake search API that counts its calls."""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str) -> list[dict]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [
+            {"source": f"https://example.com/{query}", "page": "", "content": query}
+        ]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "search_cache.sqlite")
+
+
+def test_identical_queries_in_flight_are_coalesced(path):
+    cache = SearchCache(path)
+    backend = Backend(delay=0.2)
+    queries = ["AI agents", "ai agents?", " AI  Agents", "ai agents.", "AI AGENTS"]
+
+    with ThreadPoolExecutor(len(queries)) as executor:
+        results = list(executor.map(lambda q: cache.search("web", q, backend), queries))
+
+    assert backend.calls == 1
+    assert all(result == results[0] for result in results)
+    assert cache.stats.misses == 1
+    assert cache.stats.coalesced == len(queries) - 1
+
+    assert cache.search("web", "ai agents", backend) == results[0]
+    assert cache.stats.hits == 1
+    assert backend.calls == 1
+
+
+def test_result_stored_after_the_lookup_isnt_fetched_again(path, monkeypatch):
+    cache = SearchCache(path)
+    backend = Backend()
+    load = cache._load
+    raced = False
+
+    def racing_load(key, **kwargs):
+        nonlocal raced
+        documents = load(key, **kwargs)
+        if not raced:
+            raced = True
+            # An identical search starts and finishes between this lookup and the
+            # moment this one claims the query
+            cache.search("web", "ai agents", backend)
+        return documents
+
+    monkeypatch.setattr(cache, "_load", racing_load)
+    cache.search("web", "AI agents", backend)
+
+    assert backend.calls == 1
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+
+def test_failures_reach_every_waiter_and_arent_stored(path):
+    cache = SearchCache(path)
+    backend = Backend(delay=0.1, error=RuntimeError("rate limited"))
+
+    def search(_):
+        with pytest.raises(RuntimeError):
+            cache.search("web", "ai agents", backend)
+
+    with ThreadPoolExecutor(3) as executor:
+        list(executor.map(search, range(3)))
+    assert backend.calls == 1
+
+    backend.error = None
+    assert cache.search("web", "ai agents", backend)
+    assert backend.calls == 2
+
+
+def test_expired_results_are_fetched_again(path):
+    cache = SearchCache(path, ttl=0.05)
+    backend = Backend()
+    cache.search("wikipedia", "ai agents", backend)
+    time.sleep(0.1)
+
+    cache.search("wikipedia", "ai agents", backend)
+    assert backend.calls == 2
+    assert cache.stats.expired == 1
+
+
+def test_replay_serves_recorded_results_only(path):
+    backend = Backend()
+    recorded = SearchCache(path, ttl=0.01).search("web", "ai agents", backend)
+    time.sleep(0.05)
+
+    replay = SearchCache(path, ttl=0.01, replay=True)
+    assert replay.search("web", "AI agents?", backend) == recorded
+    with pytest.raises(ReplayMiss):
+        replay.search("web", "something else", backend)
+    with pytest.raises(ReplayMiss):
+        replay.search("wikipedia", "ai agents", backend)
+    assert backend.calls == 1
+
+
+def test_seen_sources_drop_documents_other_analysts_have():
+    seen = SeenSources()
+    first = [
+        {"source": "https://Example.com/a/", "content": "a"},
+        {"source": "https://example.com/b#intro", "content": "b"},
+    ]
+    second = [
+        {"source": "https://example.com/a", "content": "a"},
+        {"source": "https://example.com/c", "content": "c"},
+    ]
+
+    assert seen.filter(first) == first
+    assert seen.filter(second) == second[1:]
+    assert seen.duplicates == 1
+
+    # Dropping every result would leave the interview with an empty context
+    assert seen.filter(first) == first
+    assert seen.duplicates == 3